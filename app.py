@@ -6,20 +6,23 @@ RAG PDF Chatbot - Ana CLI Uygulaması
 import os
 import sys
 import argparse
+import threading
 import yaml
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+try:
+    # uvloop varsa async sorgular daha hızlı event loop'ta çalışır
+    from uvloop import run as run_async
+except ImportError:
+    from asyncio import run as run_async
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional, Union
 from dotenv import load_dotenv
 import logging
 
-from src.pdf_processor import PDFProcessor
-from src.text_splitter import TextSplitter
-from src.embeddings import EmbeddingGenerator
-from src.vector_store import VectorStore
-from src.llm_handler import OllamaLLMHandler
-from src.rag_chain import RAGChain
-from src.memory import MemoryManager
-from langchain.schema import Document
-
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -30,11 +33,68 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 
+@lru_cache(maxsize=4)
+def _get_embedder(
+    model_name: str,
+    device: str,
+    batch_size: int,
+    backend: str,
+    fp16: bool,
+    quantize: bool,
+    onnx_optimization: Optional[str],
+    cache_path: Optional[str]
+) -> "EmbeddingGenerator":
+    """Aynı model/cihaz için embedding modelini tekrar yüklemeden paylaşır"""
+    from src.embeddings import EmbeddingGenerator
+    
+    return EmbeddingGenerator(
+        model_name=model_name,
+        batch_size=batch_size,
+        device=device,
+        backend=backend,
+        fp16=fp16,
+        quantize=quantize,
+        onnx_optimization=onnx_optimization,
+        cache_path=cache_path
+    )
+
+
+@lru_cache(maxsize=4)
+def _get_llm_handler(
+    model_name: str,
+    base_url: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: int,
+    use_chat: bool,
+    keep_alive: Optional[Union[int, str]]
+) -> "OllamaLLMHandler":
+    """Aynı ayarlara sahip LLM handler'ı tekrar oluşturmadan paylaşır"""
+    from src.llm_handler import OllamaLLMHandler
+    
+    return OllamaLLMHandler(
+        model_name=model_name,
+        base_url=base_url,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        use_chat=use_chat,
+        keep_alive=keep_alive
+    )
+
+
 class RAGChatbot:
     """RAG PDF Chatbot ana sınıfı"""
     
-    def __init__(self, config_path: str = "config.yaml"):
-        """Yapılandırma dosyasını yükler ve bileşenleri başlatır"""
+    def __init__(self, config_path: str = "config.yaml", device: str = None):
+        """
+        Yapılandırma dosyasını yükler ve bileşenleri başlatır
+        
+        Args:
+            config_path: Yapılandırma dosyası yolu
+            device: Embedding cihazı (None ise RAG_DEVICE, config veya otomatik seçim)
+        """
+        self.device = device
         self.config = self._load_config(config_path)
         self._initialize_components()
         self.current_pdf = None
@@ -43,7 +103,7 @@ class RAGChatbot:
         """Yapılandırma dosyasını yükler"""
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=SafeLoader)
             logger.info(f"Yapılandırma yüklendi: {config_path}")
             return config
         except FileNotFoundError:
@@ -55,10 +115,19 @@ class RAGChatbot:
     
     def _initialize_components(self):
         """Tüm bileşenleri başlatır"""
+        # Ağır bağımlılıklar (torch, chromadb, langchain) sadece burada yüklenir;
+        # --help ve yapılandırma hataları hızlı döner
+        from src.pdf_processor import PDFProcessor
+        from src.text_splitter import TextSplitter
+        from src.embeddings import configure_torch_threads, resolve_device
+        from src.memory import MemoryManager
+        from src.answer_cache import AnswerCache
+        
         # PDF Processor
         pdf_config = self.config.get('pdf', {})
         self.pdf_processor = PDFProcessor(
-            max_file_size_mb=pdf_config.get('max_file_size_mb', 50)
+            max_file_size_mb=pdf_config.get('max_file_size_mb', 50),
+            max_workers=pdf_config.get('max_workers')
         )
         
         # Text Splitter
@@ -66,36 +135,74 @@ class RAGChatbot:
         self.text_splitter = TextSplitter(
             chunk_size=chunking_config.get('chunk_size', 500),
             chunk_overlap=chunking_config.get('chunk_overlap', 150),
-            separators=chunking_config.get('separators', ["\n\n", "\n", ". ", " ", ""])
+            separators=chunking_config.get('separators', ["\n\n", "\n", ". ", " ", ""]),
+            max_workers=chunking_config.get('max_workers')
         )
         
         # Embedding Generator
         embedding_config = self.config.get('embedding', {})
         model_name = os.getenv('EMBEDDING_MODEL') or embedding_config.get('model_name', 'sentence-transformers/all-MiniLM-L6-v2')
-        self.embedding_generator = EmbeddingGenerator(model_name=model_name)
+        device = resolve_device(
+            self.device or os.getenv('RAG_DEVICE') or embedding_config.get('device')
+        )
+        embedding_backend = embedding_config.get('backend', 'torch')
+        if device == 'cpu' and embedding_backend == 'torch':
+            configure_torch_threads(embedding_config.get('num_threads'))
+        self.embedding_generator = _get_embedder(
+            model_name,
+            device,
+            embedding_config.get('batch_size', 64),
+            embedding_backend,
+            embedding_config.get('fp16', True),
+            embedding_config.get('quantize', False),
+            embedding_config.get('onnx_optimization', 'O2'),
+            embedding_config.get('cache_path')
+        )
         
-        # Vector Store (LangChain Chroma)
+        # Vector Store (LangChain Chroma veya FAISS)
         vector_db_config = self.config.get('vector_db', {})
-        persist_dir = os.getenv('CHROMA_PERSIST_DIRECTORY') or vector_db_config.get('persist_directory', './data/chroma_db')
         collection_name = vector_db_config.get('collection_name_prefix', 'pdf_collection')
-        self.vector_store = VectorStore(
-            persist_directory=persist_dir,
-            collection_name=collection_name,
-            embeddings=self.embedding_generator.get_langchain_embeddings()
-        )
+        backend = vector_db_config.get('backend', 'chroma')
+        if backend == 'faiss':
+            from src.faiss_store import FaissVectorStore
+            
+            self.vector_store = FaissVectorStore(
+                persist_directory=vector_db_config.get('faiss_persist_directory', './data/faiss_db'),
+                collection_name=collection_name,
+                embeddings=self.embedding_generator.get_langchain_embeddings(),
+                batch_size=vector_db_config.get('batch_size', 512),
+                index_type=vector_db_config.get('faiss_index_type', 'flat'),
+                compress_min_vectors=vector_db_config.get('faiss_compress_min_vectors', 100_000),
+                nprobe=vector_db_config.get('faiss_nprobe', 32)
+            )
+        else:
+            from src.vector_store import VectorStore
+            
+            persist_dir = os.getenv('CHROMA_PERSIST_DIRECTORY') or vector_db_config.get('persist_directory', './data/chroma_db')
+            self.vector_store = VectorStore(
+                persist_directory=persist_dir,
+                collection_name=collection_name,
+                embeddings=self.embedding_generator.get_langchain_embeddings(),
+                batch_size=vector_db_config.get('batch_size', 512),
+                archive_directory=vector_db_config.get('embedding_archive_directory', './data/emb'),
+                archive_quantization=vector_db_config.get('embedding_archive_quantization'),
+                index_params=vector_db_config.get('index_params'),
+                similarity_metric=vector_db_config.get('similarity_metric', 'ip')
+            )
         
         # LLM Handler (LangChain Ollama)
         llm_config = self.config.get('llm', {})
         base_url = os.getenv('OLLAMA_BASE_URL') or llm_config.get('base_url', 'http://localhost:11434')
         model_name = os.getenv('OLLAMA_MODEL') or llm_config.get('model_name', 'mistral')
         use_chat = llm_config.get('use_chat', False)
-        self.llm_handler = OllamaLLMHandler(
-            model_name=model_name,
-            base_url=base_url,
-            temperature=llm_config.get('temperature', 0.7),
-            max_tokens=llm_config.get('max_tokens', 1000),
-            timeout=llm_config.get('timeout', 30),
-            use_chat=use_chat
+        self.llm_handler = _get_llm_handler(
+            model_name,
+            base_url,
+            llm_config.get('temperature', 0.7),
+            llm_config.get('max_tokens', 1000),
+            llm_config.get('timeout', 30),
+            use_chat,
+            llm_config.get('keep_alive', '30m')
         )
         
         # Memory Manager (LangChain Memory)
@@ -112,20 +219,22 @@ class RAGChatbot:
         else:
             self.memory_manager = None
         
-        # RAG Chain (LangChain Chains)
+        # Cevap önbelleği chain yeniden oluşturulsa da korunur (anahtar collection ve versiyonu içerir)
         rag_config = self.config.get('rag', {})
-        chain_type = rag_config.get('chain_type', 'stuff')
-        return_source_documents = rag_config.get('return_source_documents', True)
-        self.rag_chain = RAGChain(
-            vector_store=self.vector_store,
-            llm_handler=self.llm_handler,
-            memory_manager=self.memory_manager,
-            chain_type=chain_type,
-            top_k=rag_config.get('top_k', 5),
-            return_source_documents=return_source_documents
-        )
+        answer_cache_size = rag_config.get('answer_cache_size', 256)
+        self.answer_cache = AnswerCache(
+            max_entries=answer_cache_size,
+            ttl=rag_config.get('answer_cache_ttl', 3600)
+        ) if answer_cache_size else None
+        
+        # RAG Chain (LangChain Chains)
+        self._recreate_rag_chain()
         
         self.current_collection_name = None  # Aktif collection adı
+        # Model ilk soruya kadar yüklenmiş olsun diye arka planda ısıt
+        if llm_config.get('warmup', True):
+            threading.Thread(target=self.llm_handler.warmup, daemon=True).start()
+        
         logger.info("Tüm bileşenler başlatıldı (LangChain entegrasyonu ile)")
     
     def load_pdf(self, pdf_path: str):
@@ -143,23 +252,16 @@ class RAGChatbot:
             print(f"Dosya Boyutu: {pdf_info['file_size_mb']} MB")
             print(f"{'='*50}\n")
             
-            # LangChain Document Loader ile PDF yükle
-            print("PDF LangChain Document Loader ile yükleniyor...")
-            documents = self.pdf_processor.load_documents(pdf_path)
+            # Büyük PDF'lerde sayfalar process havuzunda paralel yüklenir
+            print("PDF sayfaları yükleniyor...")
+            documents = self.pdf_processor.load_documents(
+                pdf_path, total_pages=pdf_info['total_pages']
+            )
             print(f"✓ {len(documents)} sayfa yüklendi\n")
             
             # Chunk'lara böl (LangChain TextSplitter ile)
             print("Metin chunk'lara bölünüyor...")
-            chunking_config = self.config.get('chunking', {})
-            from langchain.text_splitter import RecursiveCharacterTextSplitter
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunking_config.get('chunk_size', 500),
-                chunk_overlap=chunking_config.get('chunk_overlap', 150),
-                separators=chunking_config.get('separators', ["\n\n", "\n", ". ", " ", ""])
-            )
-            
-            # Document'leri chunk'lara böl
-            chunked_documents = text_splitter.split_documents(documents)
+            chunked_documents = self.text_splitter.split_documents(documents)
             print(f"✓ {len(chunked_documents)} chunk oluşturuldu\n")
             
             # Collection'ı PDF dosya adına göre oluştur/güncelle
@@ -174,17 +276,7 @@ class RAGChatbot:
             print(f"✓ {len(chunked_documents)} doküman kaydedildi\n")
             
             # RAG chain'i yeniden oluştur (yeni collection için)
-            rag_config = self.config.get('rag', {})
-            chain_type = rag_config.get('chain_type', 'stuff')
-            return_source_documents = rag_config.get('return_source_documents', True)
-            self.rag_chain = RAGChain(
-                vector_store=self.vector_store,
-                llm_handler=self.llm_handler,
-                memory_manager=self.memory_manager,
-                chain_type=chain_type,
-                top_k=rag_config.get('top_k', 5),
-                return_source_documents=return_source_documents
-            )
+            self._recreate_rag_chain()
             
             print(f"{'='*50}")
             print(f"✓ PDF başarıyla yüklendi ve işlendi!")
@@ -225,28 +317,14 @@ class RAGChatbot:
                 print(f"\n✓ Collection yüklendi: {collection_name} ({collections_with_docs[0]['count']} doküman)\n")
             else:
                 # Birden fazla collection varsa kullanıcıya seçtir
-                print("\nMevcut PDF collection'ları:")
-                for i, col in enumerate(collections_with_docs, 1):
-                    print(f"  [{i}] {col['name']} ({col['count']} doküman)")
-                
-                while True:
-                    try:
-                        choice = input("\nKullanmak istediğiniz collection numarasını girin: ").strip()
-                        idx = int(choice) - 1
-                        if 0 <= idx < len(collections_with_docs):
-                            collection_name = collections_with_docs[idx]['name']
-                            self.vector_store.switch_collection(collection_name)
-                            self.current_collection_name = collection_name
-                            self._recreate_rag_chain()
-                            print(f"\n✓ Collection yüklendi: {collection_name}\n")
-                            break
-                        else:
-                            print("❌ Geçersiz seçim. Lütfen geçerli bir numara girin.")
-                    except ValueError:
-                        print("❌ Lütfen bir sayı girin.")
-                    except KeyboardInterrupt:
-                        print("\n\nİşlem iptal edildi.\n")
-                        return
+                collection_name = self._select_collection(collections_with_docs)
+                if collection_name is None:
+                    print("\n\nİşlem iptal edildi.\n")
+                    return
+                self.vector_store.switch_collection(collection_name)
+                self.current_collection_name = collection_name
+                self._recreate_rag_chain()
+                print(f"\n✓ Collection yüklendi: {collection_name}\n")
         
         # Memory temizle (yeni sohbet başlatılıyor)
         if self.memory_manager:
@@ -278,10 +356,21 @@ class RAGChatbot:
                     continue
                 
                 # RAG sorgusu (LangChain chain ile)
-                result = self.rag_chain.query(question)
-                
-                # Cevabı göster
-                print(f"\nBot: {result['answer']}\n")
+                if self.rag_chain.uses_concurrent_llm_calls:
+                    # Doküman başına LLM çağrıları eşzamanlı gönderilir
+                    result = run_async(self.rag_chain.aquery(question))
+                    print(f"\nBot: {result['answer']}\n")
+                elif self.config.get('cli', {}).get('streaming', False):
+                    # Cevabı token token yazdır
+                    sys.stdout.write("\nBot: ")
+                    for token in self.rag_chain.query_streaming(question):
+                        sys.stdout.write(token)
+                        sys.stdout.flush()
+                    sys.stdout.write("\n\n")
+                    result = {'sources': self.rag_chain.last_sources}
+                else:
+                    result = self.rag_chain.query(question)
+                    print(f"\nBot: {result['answer']}\n")
                 
                 # Kaynakları göster
                 if result['sources'] and self.config.get('cli', {}).get('show_sources', True):
@@ -298,8 +387,39 @@ class RAGChatbot:
                 logger.error(f"Sohbet hatası: {e}")
                 print(f"\n❌ Hata: {e}\n")
     
+    @staticmethod
+    def _select_collection(collections: list) -> Optional[str]:
+        """
+        Kullanıcıya collection listesini gösterip geçerli bir numara girilene kadar sorar.
+        
+        Args:
+            collections: {'name', 'count'} içeren collection listesi
+            
+        Returns:
+            str: Seçilen collection adı (iptal edilirse None)
+        """
+        print("\nMevcut PDF collection'ları:")
+        for i, col in enumerate(collections, 1):
+            print(f"  [{i}] {col['name']} ({col['count']} doküman)")
+        
+        count = len(collections)
+        while True:
+            try:
+                choice = input("\nKullanmak istediğiniz collection numarasını girin: ").strip()
+            except KeyboardInterrupt:
+                return None
+            
+            if not choice.isdigit():
+                print("❌ Lütfen bir sayı girin.")
+            elif 1 <= int(choice) <= count:
+                return collections[int(choice) - 1]['name']
+            else:
+                print("❌ Geçersiz seçim. Lütfen geçerli bir numara girin.")
+    
     def _recreate_rag_chain(self):
         """RAG chain'i yeniden oluşturur (collection değiştiğinde)"""
+        from src.rag_chain import RAGChain
+        
         rag_config = self.config.get('rag', {})
         chain_type = rag_config.get('chain_type', 'stuff')
         return_source_documents = rag_config.get('return_source_documents', True)
@@ -309,7 +429,13 @@ class RAGChatbot:
             memory_manager=self.memory_manager,
             chain_type=chain_type,
             top_k=rag_config.get('top_k', 5),
-            return_source_documents=return_source_documents
+            return_source_documents=return_source_documents,
+            semantic_cache_threshold=rag_config.get('semantic_cache_threshold'),
+            answer_cache=self.answer_cache,
+            stable_context_order=rag_config.get('stable_context_order', True),
+            retrieval_gate=rag_config.get('retrieval_gate', False),
+            similarity_threshold=rag_config.get('similarity_threshold'),
+            verbose=rag_config.get('verbose', False)
         )
 
 
@@ -337,11 +463,25 @@ def main():
         default='config.yaml',
         help='Yapılandırma dosyası yolu (varsayılan: config.yaml)'
     )
+    parser.add_argument(
+        '--cuda',
+        action='store_true',
+        help='Embedding modelini GPU (CUDA) üzerinde çalıştır'
+    )
     
     args = parser.parse_args()
     
+    device = None
+    if args.cuda:
+        from src.embeddings import cuda_available
+        
+        if not cuda_available():
+            print("❌ --cuda istendi ancak CUDA destekli GPU bulunamadı.")
+            sys.exit(1)
+        device = 'cuda'
+    
     # Chatbot'u başlat
-    chatbot = RAGChatbot(config_path=args.config)
+    chatbot = RAGChatbot(config_path=args.config, device=device)
     
     # Komut işle
     if args.command == 'load':
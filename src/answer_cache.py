@@ -0,0 +1,126 @@
+"""
+Cevap Önbelleği Modülü
+Aynı soru tekrar sorulduğunda retrieval ve LLM çağrısı yapmadan önceki cevabı döndürür.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Soruyu önbellek anahtarı için normalize eder (küçük harf, tek boşluk)"""
+    return " ".join(question.lower().split())
+
+
+def make_answer_key(question: str, filter_metadata: Optional[Dict] = None, *scope: Any) -> str:
+    """
+    Cevap önbelleği anahtarı üretir.
+    
+    Args:
+        question: Kullanıcı sorusu
+        filter_metadata: Metadata filtresi (opsiyonel)
+        *scope: Cevabı etkileyen diğer değerler (collection, top_k, chain tipi vb.)
+        
+    Returns:
+        str: Hex anahtar
+    """
+    payload = json.dumps(
+        [normalize_question(question), filter_metadata, *scope],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class AnswerCache:
+    """
+    LRU + TTL cevap önbelleği (thread-safe).
+    
+    Kayıt sayısı max_entries'i veya tahmini toplam boyut max_bytes'ı aşınca
+    en eski kullanılan kayıtlar silinir; süresi dolan kayıtlar okunurken atılır.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: Optional[float] = 3600,
+        max_bytes: int = 100 * 1024 * 1024
+    ):
+        """
+        Args:
+            max_entries: Saklanacak en fazla cevap sayısı
+            ttl: Kayıt ömrü (saniye, None ise süresiz)
+            max_bytes: Cevapların tahmini toplam boyut sınırı
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (expires_at, size, response)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Anahtarın cevabını döndürür (yoksa veya süresi dolduysa None).
+        
+        Args:
+            key: make_answer_key ile üretilmiş anahtar
+            
+        Returns:
+            Optional[Dict]: {'answer', 'sources'} kopyası
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, _, response = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            
+            self._entries.move_to_end(key)
+            logger.info("Cevap önbelleği isabeti")
+            return dict(response)
+    
+    def put(self, key: str, response: Dict) -> None:
+        """
+        Cevabı önbelleğe yazar.
+        
+        Args:
+            key: make_answer_key ile üretilmiş anahtar
+            response: {'answer', 'sources'} cevabı
+        """
+        size = len(json.dumps(response, ensure_ascii=False, default=str).encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, dict(response))
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+    
+    def _remove(self, key: str):
+        """Kaydı siler (kilit altında çağrılır)"""
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+    
+    def clear(self) -> None:
+        """Tüm kayıtları siler"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
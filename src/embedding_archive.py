@@ -0,0 +1,334 @@
+"""
+Embedding Arşivi Modülü
+Collection embedding'lerini tek bir bitişik float32 .npy matrisi olarak saklar.
+Arama mmap ile yüklenen matris üzerinde tek bir matris-vektör çarpımıyla (BLAS) yapılır.
+"""
+
+import io
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# int8 quantization ölçeği: [-1, 1] aralığı [-127, 127]'ye eşlenir
+INT8_SCALE = 127.0
+
+# int8 aramada blok başına int32'ye çevrilen en fazla byte (geçici blok cache'te kalacak boyutta)
+_INT8_BLOCK_BYTES = 1 << 20
+
+# Byte başına 1 bit sayısı (Hamming mesafesi için popcount tablosu)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+class EmbeddingArchive:
+    """
+    Collection başına embedding matrisi ({name}.npy) ve paralel ID dizisi ({name}_ids.npy) saklar.
+    
+    Embedding'ler L2-normalize olduğu için (normalize_embeddings=True)
+    matris-vektör çarpımı doğrudan cosine benzerliğini verir.
+    
+    quantization="int8" ile her bileşen round(x * 127) olarak int8 saklanır
+    (normalize vektörlerde |x| <= 1); dosya boyutu ve okunan bellek 4 kat azalır.
+    
+    quantization="binary" ile her bileşenin sadece işareti saklanır (boyut başına 1 bit,
+    32 kat küçük). İlk aşamada Hamming mesafesiyle k * rerank_oversample aday seçilir,
+    adaylar ayrı dosyadaki ({name}_rerank.npy) float32 vektörlerle yeniden sıralanır;
+    tüm float matris okunmaz, sadece aday satırlar.
+    """
+    
+    def __init__(
+        self,
+        directory: str = "./data/emb",
+        quantization: Optional[str] = None,
+        rerank_oversample: int = 4
+    ):
+        """
+        Args:
+            directory: .npy dosyalarının saklandığı dizin
+            quantization: None (float32), "int8" veya "binary"
+            rerank_oversample: binary modda float rerank'e giren aday sayısı çarpanı
+        """
+        if quantization not in (None, "int8", "binary"):
+            raise ValueError(f"Desteklenmeyen quantization: {quantization}")
+        
+        self.directory = directory
+        self.quantization = quantization
+        self.rerank_oversample = rerank_oversample
+        # collection adı -> (ids, mmap'li matris); dosyalar bu nesne üzerinden değiştikçe yenilenir
+        self._loaded: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # collection adı -> {ID: satır}; append'te güncellenen satırları bulmak için
+        self._rows: Dict[str, Dict[str, int]] = {}
+        os.makedirs(directory, exist_ok=True)
+    
+    def _paths(self, collection_name: str) -> Tuple[str, str]:
+        """Embedding ve ID dosyalarının yolları"""
+        return (
+            os.path.join(self.directory, f"{collection_name}.npy"),
+            os.path.join(self.directory, f"{collection_name}_ids.npy")
+        )
+    
+    def _rerank_path(self, collection_name: str) -> str:
+        """binary modda rerank için saklanan float32 matrisin yolu"""
+        return os.path.join(self.directory, f"{collection_name}_rerank.npy")
+    
+    def _encode(self, embeddings) -> Tuple[np.ndarray, np.ndarray]:
+        """Embedding'leri saklama formatına çevirir: (saklanan matris, float32 matris)"""
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.quantization == "int8":
+            return np.clip(np.round(vectors * INT8_SCALE), -INT8_SCALE, INT8_SCALE).astype(np.int8), vectors
+        if self.quantization == "binary":
+            return np.packbits(vectors > 0, axis=1), vectors
+        return vectors, vectors
+    
+    def _invalidate(self, collection_name: str) -> None:
+        """Collection'ın önbellekteki ids/matris/satır eşlemesini atar"""
+        self._loaded.pop(collection_name, None)
+        self._rows.pop(collection_name, None)
+    
+    def save(self, collection_name: str, ids: List[str], embeddings) -> None:
+        """
+        Collection'ın embedding'lerini diske yazar (var olan arşivin üzerine).
+        
+        Args:
+            collection_name: Collection adı
+            ids: Doküman ID'leri (embedding satırlarıyla aynı sırada)
+            embeddings: Embedding vektörleri (liste veya ndarray)
+        """
+        emb_path, ids_path = self._paths(collection_name)
+        matrix, vectors = self._encode(embeddings)
+        if self.quantization == "binary":
+            np.save(self._rerank_path(collection_name), vectors)
+        np.save(emb_path, matrix)
+        np.save(ids_path, np.asarray(ids, dtype=np.str_))
+        self._invalidate(collection_name)
+        logger.info(f"Embedding arşivi kaydedildi: {emb_path} {matrix.shape}")
+    
+    def append(self, collection_name: str, ids: List[str], embeddings) -> None:
+        """
+        Yeni yazılan embedding'leri arşive işler: arşivde olmayan ID'ler dosyaların
+        sonuna eklenir, var olanların satırları yerinde güncellenir. Mevcut satırlar
+        yeniden okunup yazılmaz; maliyet eklenen satır sayısıyla orantılıdır.
+        
+        Args:
+            collection_name: Collection adı
+            ids: Doküman ID'leri (embedding satırlarıyla aynı sırada, tekrarsız)
+            embeddings: Embedding vektörleri (liste veya ndarray)
+        """
+        emb_path, ids_path = self._paths(collection_name)
+        if not (os.path.exists(emb_path) and os.path.exists(ids_path)):
+            self.save(collection_name, ids, embeddings)
+            return
+        
+        rows = self._row_index(collection_name)
+        matrix, vectors = self._encode(embeddings)
+        updated = [i for i, doc_id in enumerate(ids) if doc_id in rows]
+        added = [i for i, doc_id in enumerate(ids) if doc_id not in rows]
+        
+        paths = [(emb_path, matrix)]
+        if self.quantization == "binary":
+            paths.append((self._rerank_path(collection_name), vectors))
+        
+        if updated:
+            targets = [rows[ids[i]] for i in updated]
+            for path, source in paths:
+                stored = np.load(path, mmap_mode='r+')
+                stored[targets] = source[updated]
+                stored.flush()
+                del stored
+        
+        if added:
+            for path, source in paths:
+                if not _append_rows(path, source[added]):
+                    # Format uyuşmazlığı (dtype/boyut değişmiş): dosya tamamen yeniden yazılır
+                    np.save(path, np.concatenate([np.load(path), source[added]]))
+            new_ids = np.asarray([ids[i] for i in added], dtype=np.str_)
+            if not _append_rows(ids_path, new_ids):
+                # Daha uzun bir ID geldi; sabit genişlikli ID dizisi yeniden yazılır
+                np.save(ids_path, np.concatenate([np.load(ids_path), new_ids]))
+            start = len(rows)
+            rows.update((ids[i], start + offset) for offset, i in enumerate(added))
+        
+        self._loaded.pop(collection_name, None)
+        logger.info(f"Embedding arşivi güncellendi: {len(added)} eklendi, {len(updated)} güncellendi")
+    
+    def _row_index(self, collection_name: str) -> Dict[str, int]:
+        """ID -> satır eşlemesi (ilk kullanımda ID dosyasından kurulur)"""
+        rows = self._rows.get(collection_name)
+        if rows is None:
+            ids = np.load(self._paths(collection_name)[1])
+            rows = {str(doc_id): i for i, doc_id in enumerate(ids)}
+            self._rows[collection_name] = rows
+        return rows
+    
+    def load(self, collection_name: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Arşivi mmap ile yükler (sayfalar process'ler arasında paylaşılır).
+        
+        Args:
+            collection_name: Collection adı
+            
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: (ids, embeddings) veya arşiv yoksa None
+        """
+        loaded = self._loaded.get(collection_name)
+        if loaded is not None:
+            return loaded
+        
+        emb_path, ids_path = self._paths(collection_name)
+        if not (os.path.exists(emb_path) and os.path.exists(ids_path)):
+            return None
+        loaded = (np.load(ids_path), np.load(emb_path, mmap_mode='r'))
+        self._loaded[collection_name] = loaded
+        return loaded
+    
+    def count(self, collection_name: str) -> int:
+        """Arşivdeki vektör sayısı (arşiv yoksa 0)"""
+        emb_path, _ = self._paths(collection_name)
+        if not os.path.exists(emb_path):
+            return 0
+        return np.load(emb_path, mmap_mode='r').shape[0]
+    
+    def search(
+        self,
+        collection_name: str,
+        query_embedding: List[float],
+        k: int = 5
+    ) -> List[Tuple[str, float]]:
+        """
+        Sorguya en benzer k vektörü bulur.
+        
+        Args:
+            collection_name: Collection adı
+            query_embedding: Normalize edilmiş sorgu embedding'i
+            k: Döndürülecek sonuç sayısı
+            
+        Returns:
+            List[Tuple[str, float]]: (ID, cosine benzerliği) listesi, benzerliğe göre azalan
+        """
+        archive = self.load(collection_name)
+        if not archive:
+            return []
+        
+        ids, matrix = archive
+        if len(ids) == 0:
+            return []
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if matrix.dtype == np.uint8:
+            return self._search_binary(collection_name, ids, matrix, query, k)
+        if matrix.dtype == np.int8:
+            scores = self._score_int8(matrix, query)
+        else:
+            scores = matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(str(ids[i]), float(scores[i])) for i in top]
+    
+    @staticmethod
+    def _score_int8(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        int8 matrisi bloklar halinde int8'e quantize edilmiş sorguyla çarpar (int32 birikim).
+        Tüm matris hiçbir zaman float32'ye çevrilmez; bellekten satır başına D byte okunur.
+        
+        Args:
+            matrix: Quantize edilmiş embedding'ler (N x D, int8; mmap olabilir)
+            query: Normalize edilmiş sorgu embedding'i (float32)
+            
+        Returns:
+            np.ndarray: Yaklaşık cosine benzerlikleri (N, float32)
+        """
+        query_int = np.clip(np.round(query * INT8_SCALE), -INT8_SCALE, INT8_SCALE).astype(np.int32)
+        block = max(1, _INT8_BLOCK_BYTES // (4 * matrix.shape[1]))
+        scores = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), block):
+            np.dot(matrix[start:start + block].astype(np.int32), query_int, out=scores[start:start + block])
+        return scores.astype(np.float32) / (INT8_SCALE * INT8_SCALE)
+    
+    def _search_binary(
+        self,
+        collection_name: str,
+        ids: np.ndarray,
+        bits: np.ndarray,
+        query: np.ndarray,
+        k: int
+    ) -> List[Tuple[str, float]]:
+        """
+        İki aşamalı arama: Hamming mesafesiyle aday seçimi, float32 cosine ile rerank.
+        
+        Args:
+            collection_name: Collection adı
+            ids: Doküman ID'leri
+            bits: Paketlenmiş işaret bitleri (N x D/8, uint8)
+            query: Sorgu embedding'i
+            k: Döndürülecek sonuç sayısı
+            
+        Returns:
+            List[Tuple[str, float]]: (ID, cosine benzerliği) listesi, benzerliğe göre azalan
+        """
+        query_bits = np.packbits(query > 0)
+        distances = _POPCOUNT[np.bitwise_xor(bits, query_bits)].sum(axis=1, dtype=np.uint32)
+        
+        candidates = min(k * self.rerank_oversample, len(distances))
+        top = np.argpartition(distances, candidates - 1)[:candidates]
+        top.sort()  # mmap'ten sıralı satır okuması
+        
+        vectors = np.load(self._rerank_path(collection_name), mmap_mode='r')[top]
+        scores = vectors @ query
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(str(ids[top[i]]), float(scores[i])) for i in best]
+    
+    def delete(self, collection_name: str) -> None:
+        """Collection'ın arşiv dosyalarını siler"""
+        self._invalidate(collection_name)
+        for path in (*self._paths(collection_name), self._rerank_path(collection_name)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _append_rows(path: str, rows: np.ndarray) -> bool:
+    """
+    .npy dosyasının sonuna satır ekler, header'daki satır sayısını yerinde günceller.
+    numpy header'ı ilk eksenin büyümesine yetecek boşlukla yazdığından header boyu değişmez.
+    
+    Args:
+        path: .npy dosya yolu (C sıralı)
+        rows: Eklenecek satırlar
+        
+    Returns:
+        bool: Eklendiyse True; dtype, satır şekli veya header formatı uyuşmazsa False
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            read_header, write_header = np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0
+        elif version == (2, 0):
+            read_header, write_header = np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0
+        else:
+            return False
+        shape, fortran_order, dtype = read_header(f)
+        header_size = f.tell()
+        if fortran_order or shape[1:] != rows.shape[1:] or not np.can_cast(rows.dtype, dtype, casting='safe'):
+            return False
+        
+        # write_array_header_* magic string'i de yazar
+        header = io.BytesIO()
+        write_header(header, {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': False,
+            'shape': (shape[0] + len(rows), *shape[1:])
+        })
+        if header.tell() != header_size:
+            return False
+        
+        # Önce veri, sonra header: yarıda kalan yazımda dosya eski satır sayısıyla okunur
+        f.seek(0, os.SEEK_END)
+        f.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
@@ -0,0 +1,177 @@
+"""
+Embedding Önbellek Modülü
+Metin embedding'lerini SQLite'ta kalıcı olarak saklar.
+Tekrar eden sorgular ve yeniden yüklenen (örtüşen) chunk'lar için model çalıştırılmaz.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SQLite tek sorguda en fazla 999 parametre kabul eder (eski sürümler)
+_MAX_SQL_PARAMS = 900
+
+
+class EmbeddingCache:
+    """
+    blake2b(namespace + metin) anahtarıyla float32 embedding saklayan LRU önbellek.
+    
+    namespace model adını ve çıktıyı değiştiren ayarları (backend, fp16, quantize)
+    içerir; farklı modellerin vektörleri birbirine karışmaz.
+    
+    SQLite'ın önünde son kullanılan embedding'leri tutan küçük bir bellek içi LRU
+    katmanı vardır; aynı soru bir sorguda birden fazla kez embed edildiğinde
+    (semantik önbellek + retriever) veya tekrar sorulduğunda diske gidilmez.
+    """
+    
+    def __init__(
+        self,
+        path: str = "./data/emb_cache.sqlite",
+        max_entries: int = 200_000,
+        memory_entries: int = 1024
+    ):
+        """
+        Args:
+            path: SQLite dosya yolu
+            max_entries: Saklanacak en fazla embedding sayısı (aşılınca en eski kullanılanlar silinir)
+            memory_entries: Bellekte tutulacak en fazla embedding sayısı (0: kapalı)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.RLock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # Streaming sorgular embedding'i ayrı thread'de üretir
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(namespace: str, text: str) -> bytes:
+        """Metin için önbellek anahtarı üretir"""
+        return hashlib.blake2b(f"{namespace}\x00{text}".encode('utf-8'), digest_size=16).digest()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Önbellekte bulunan embedding'leri döndürür (bulunanların kullanım zamanı güncellenir).
+        
+        Args:
+            keys: Önbellek anahtarları
+            
+        Returns:
+            Dict[bytes, np.ndarray]: Anahtar -> embedding (sadece bulunanlar)
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            if len(found) == len(keys):
+                return found
+            
+            missing = [key for key in keys if key not in found]
+            from_disk = {}
+            for start in range(0, len(missing), _MAX_SQL_PARAMS):
+                batch = missing[start:start + _MAX_SQL_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                from_disk.update((key, np.frombuffer(vec, dtype=np.float32)) for key, vec in rows)
+            
+            if from_disk:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in from_disk]
+                )
+                self._conn.commit()
+                self._remember(from_disk.items())
+                found.update(from_disk)
+        return found
+    
+    def _remember(self, items) -> None:
+        """Embedding'leri bellek içi LRU katmanına ekler (kilit altında çağrılır)"""
+        if not self.memory_entries:
+            return
+        
+        for key, vector in items:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """
+        Embedding'leri önbelleğe yazar.
+        
+        Args:
+            keys: Önbellek anahtarları
+            vectors: Anahtarlarla aynı sırada embedding matrisi (N x D)
+        """
+        if not keys:
+            return
+        
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec, last_used) VALUES (?, ?, ?)",
+                [(key, vector.tobytes(), now) for key, vector in zip(keys, vectors)]
+            )
+            self._evict()
+            self._conn.commit()
+            # Büyük doküman batch'leri bellek katmanındaki sorguları silmesin;
+            # sadece zaten bellekte olan anahtarlar güncellenir
+            if len(keys) <= self.memory_entries // 4:
+                self._remember(zip(keys, vectors))
+            else:
+                for key, vector in zip(keys, vectors):
+                    if key in self._memory:
+                        self._memory[key] = vector
+    
+    def _evict(self):
+        """max_entries aşıldıysa en eski kullanılan kayıtları siler (kilit altında çağrılır)"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            logger.info(f"Embedding önbelleğinden {overflow} eski kayıt silindi")
+    
+    def clear(self) -> None:
+        """Önbelleği temizler"""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+    
+    def close(self) -> None:
+        """SQLite bağlantısını kapatır"""
+        with self._lock:
+            self._conn.close()
@@ -4,32 +4,302 @@ Metinleri vektörlere dönüştürür.
 LangChain HuggingFaceEmbeddings kullanır.
 """
 
-from typing import List
+import os
+from typing import List, Optional, Tuple
+import numpy as np
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.embeddings.base import Embeddings
+from .embedding_cache import EmbeddingCache
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def cuda_available() -> bool:
+    """CUDA destekli bir GPU kullanılabilir mi kontrol eder"""
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def resolve_device(device: Optional[str] = None) -> str:
+    """
+    Embedding modelinin çalışacağı cihazı belirler.
+    
+    Args:
+        device: İstenen cihaz ("cpu", "cuda", "cuda:1", ...). None veya "auto"
+            ise CUDA varsa "cuda", yoksa "cpu" seçilir.
+        
+    Returns:
+        str: Cihaz adı
+    """
+    if device and device != 'auto':
+        return device
+    return 'cuda' if cuda_available() else 'cpu'
+
+
+def configure_torch_threads(num_threads: Optional[int] = None):
+    """
+    CPU'da embedding için PyTorch thread sayısını ayarlar.
+    Sentence encoder'larda 8 thread'in üzerinde kazanç azalır.
+    
+    Args:
+        num_threads: Intra-op thread sayısı (None ise min(8, CPU sayısı))
+    """
+    import torch
+    
+    num_threads = num_threads or min(8, os.cpu_count() or 1)
+    torch.set_num_threads(num_threads)
+    try:
+        # Sadece ilk paralel işten önce ayarlanabilir
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    logger.info(f"PyTorch thread sayısı: {num_threads}")
+
+
+def _onnx_provider(device: str) -> str:
+    """Cihaza göre ONNX Runtime execution provider'ı seçer"""
+    return 'CUDAExecutionProvider' if device.startswith('cuda') else 'CPUExecutionProvider'
+
+
+class _GeneratorEmbeddings(Embeddings):
+    """Vektör veritabanlarına verilen Embeddings; doküman embedding'lerini EmbeddingGenerator üzerinden üretir"""
+    
+    def __init__(self, generator: "EmbeddingGenerator"):
+        self.generator = generator
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # LangChain arayüzü liste bekler
+        return self.generator._embed_texts(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.generator._embed_texts([text])[0].tolist()
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # embed_query'nin batch versiyonu; bu modelde sorgular dokümanlarla aynı yoldan embed edilir
+        return self.generator._embed_texts(texts).tolist()
+
+
 class EmbeddingGenerator:
     """Embedding oluşturan sınıf - LangChain HuggingFaceEmbeddings wrapper"""
     
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 64,
+        device: Optional[str] = None,
+        backend: str = "torch",
+        onnx_dir: str = "./data/onnx",
+        fp16: bool = True,
+        quantize: bool = False,
+        onnx_optimization: Optional[str] = "O2",
+        cache_path: Optional[str] = None
+    ):
         """
         Args:
             model_name: Sentence transformers model adı
+            batch_size: Encode batch boyutu. SentenceTransformer.encode metinleri
+                uzunluğa göre sıralayıp batch'lediği için padding zaten minimumdur,
+                bu yüzden varsayılandan (32) büyük batch'ler güvenle kullanılabilir.
+            device: Cihaz ("cpu", "cuda", ...). None ise CUDA varsa otomatik seçilir.
+            backend: Çıkarım backend'i ("torch" veya "onnx")
+            onnx_dir: ONNX'e dönüştürülmüş modellerin saklandığı dizin
+            fp16: GPU'da (torch backend) modeli yarı hassasiyete (float16) çevir
+            quantize: CPU'da (torch backend) Linear katmanlarına dinamik int8 quantization uygula
+            onnx_optimization: CPU'da (onnx backend) graph optimizasyon seviyesi ("O1", "O2", "O3"
+                veya None). GPU'da her zaman O4 (FP16) kullanılır.
+            cache_path: Kalıcı embedding önbelleğinin SQLite dosyası (None ise önbellek kapalı)
         """
         self.model_name = model_name
-        logger.info(f"Embedding modeli yükleniyor: {model_name}")
+        self.batch_size = batch_size
+        self.device = resolve_device(device)
+        self.backend = backend
+        self._dimension = None
+        logger.info(f"Embedding modeli yükleniyor: {model_name} ({self.device}, {backend})")
+        
+        model_kwargs = {'device': self.device}
+        model_path = model_name
+        if backend == 'onnx':
+            model_path, file_name = self._prepare_onnx_model(onnx_dir, onnx_optimization)
+            model_kwargs['backend'] = 'onnx'
+            model_kwargs['model_kwargs'] = {
+                'provider': _onnx_provider(self.device),
+                'file_name': file_name
+            }
+        
         self.embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+            model_name=model_path,
+            model_kwargs=model_kwargs,
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
         )
+        # Önbellek anahtarları, çıktıyı değiştiren ayarlara göre ayrışır
+        variant = backend
+        if fp16 and backend == 'torch' and self.device.startswith('cuda'):
+            # Tensor core'larda fp16 GEMM (embed_documents çıktıyı zaten listeye çevirir)
+            self.embeddings.client.half()
+            variant = 'torch-fp16'
+            logger.info("Embedding modeli fp16'ya çevrildi")
+        elif quantize and backend == 'torch' and self.device == 'cpu':
+            self._quantize_dynamic()
+            variant = 'torch-int8'
+        elif backend == 'onnx':
+            variant = f"onnx-{file_name}"
+        self._cache_namespace = f"{model_name}|{variant}"
+        self._cache = EmbeddingCache(cache_path) if cache_path else None
+        self._langchain_embeddings = _GeneratorEmbeddings(self)
         logger.info("Embedding modeli yüklendi")
     
+    def _quantize_dynamic(self):
+        """
+        Modelin Linear katmanlarını dinamik int8 quantization ile değiştirir (yerinde).
+        Ağırlıklar int8 saklanır, GEMM'ler CPU'nun int8 (VNNI) yolunda çalışır;
+        aktivasyonlar ve normalize işlemi float32 kalır.
+        """
+        import torch
+        
+        torch.quantization.quantize_dynamic(
+            self.embeddings.client,
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+            inplace=True
+        )
+        logger.info("Embedding modeline dinamik int8 quantization uygulandı")
+    
+    def _prepare_onnx_model(self, onnx_dir: str, optimization: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Modeli ONNX'e dönüştürüp onnx_dir altına kaydeder (sadece ilk çalıştırmada).
+        Ardından Optimum ile optimize edilmiş model üretilir: CPU'da istenen seviye
+        (O2: MatMul+Add+GELU/LayerNorm füzyonları), GPU'da FP16 karışık hassasiyetli O4.
+        
+        Args:
+            onnx_dir: ONNX modellerinin saklandığı dizin
+            optimization: CPU için optimizasyon seviyesi (None ise ham model kullanılır)
+            
+        Returns:
+            Tuple[str, str]: (Model dizini, yüklenecek ONNX dosyası)
+        """
+        from sentence_transformers import SentenceTransformer
+        
+        model_path = os.path.join(onnx_dir, self.model_name.replace('/', '__'))
+        provider = _onnx_provider(self.device)
+        
+        if not os.path.exists(os.path.join(model_path, 'model.onnx')):
+            logger.info(f"Model ONNX'e dönüştürülüyor: {model_path}")
+            model = SentenceTransformer(
+                self.model_name,
+                device=self.device,
+                backend='onnx',
+                model_kwargs={'provider': provider}
+            )
+            model.save(model_path)
+        
+        if provider == 'CUDAExecutionProvider':
+            # O4: O3 füzyonları + FP16 (sadece GPU)
+            optimization = 'O4'
+        elif optimization is None:
+            return model_path, 'model.onnx'
+        elif optimization not in ('O1', 'O2', 'O3'):
+            raise ValueError(f"Desteklenmeyen ONNX optimizasyon seviyesi: {optimization}")
+        
+        optimized_file = os.path.join('onnx', f'model_{optimization}.onnx')
+        if not os.path.exists(os.path.join(model_path, optimized_file)):
+            from sentence_transformers import export_optimized_onnx_model
+            
+            logger.info(f"Optimize edilmiş ({optimization}) ONNX modeli oluşturuluyor...")
+            model = SentenceTransformer(
+                model_path,
+                device=self.device,
+                backend='onnx',
+                model_kwargs={'provider': provider, 'file_name': 'model.onnx'}
+            )
+            export_optimized_onnx_model(model, optimization, model_path)
+        return model_path, optimized_file
+    
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Metinleri embed eder; tekrar eden metinler (header/footer vb.) bir kez encode edilir.
+        Padding'i azaltmak için uzunluğa göre sıralama SentenceTransformer.encode
+        içinde zaten yapıldığından burada tekrarlanmaz.
+        
+        Args:
+            texts: Metin listesi
+            
+        Returns:
+            np.ndarray: Girdi sırasıyla embedding matrisi (N x D, float32)
+        """
+        # HuggingFaceEmbeddings ile aynı şekilde "\n"ler boşluğa çevrilir; sadece satır
+        # sonlarıyla farklılaşan metinler aynı vektörü üretir
+        unique = {}
+        positions = [unique.setdefault(text.replace("\n", " "), len(unique)) for text in texts]
+        vectors = self._encode_cached(list(unique))
+        if len(unique) == len(texts):
+            return vectors
+        
+        logger.info(f"{len(texts) - len(unique)} tekrar eden metin tekrar encode edilmedi")
+        return vectors[positions]
+    
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """
+        Önbellekte olmayan metinleri encode eder, sonuçları önbelleğe yazar.
+        
+        Args:
+            texts: Tekilleştirilmiş metin listesi
+            
+        Returns:
+            np.ndarray: Girdi sırasıyla embedding matrisi (N x D, float32)
+        """
+        if self._cache is None:
+            return self._encode(texts)
+        
+        keys = [EmbeddingCache.make_key(self._cache_namespace, text) for text in texts]
+        cached = self._cache.get_many(keys)
+        if len(cached) == len(texts):
+            return np.stack([cached[key] for key in keys])
+        
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        encoded = self._encode([texts[i] for i in missing])
+        self._cache.put_many([keys[i] for i in missing], encoded)
+        if not cached:
+            return encoded
+        
+        if len(texts) > 1:
+            logger.info(f"{len(cached)} embedding önbellekten alındı")
+        vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        vectors[missing] = encoded
+        for i, key in enumerate(keys):
+            if key in cached:
+                vectors[i] = cached[key]
+        return vectors
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Metinleri doğrudan SentenceTransformer ile encode eder (embed_documents'ın
+        .tolist() dönüşümü olmadan). GPU belleği yetmezse batch boyutu yarıya
+        indirilip tekrar denenir (yeni boyut sonraki çağrılarda da kullanılır).
+        """
+        import torch
+        
+        while True:
+            try:
+                # encode'un kendi no_grad'ından farklı olarak autograd version counter takibini de kapatır
+                with torch.inference_mode():
+                    vectors = self.embeddings.client.encode(texts, **self.embeddings.encode_kwargs)
+                return np.ascontiguousarray(vectors, dtype=np.float32)
+            except RuntimeError as e:
+                # torch.cuda.OutOfMemoryError, RuntimeError alt sınıfıdır
+                batch_size = self.embeddings.encode_kwargs.get('batch_size', 32)
+                if 'out of memory' not in str(e) or batch_size <= 1:
+                    raise
+                
+                torch.cuda.empty_cache()
+                self.embeddings.encode_kwargs['batch_size'] = batch_size // 2
+                self.batch_size = batch_size // 2
+                logger.warning(f"GPU belleği yetersiz, batch boyutu {batch_size // 2} olarak tekrar deneniyor")
+    
     def generate_embedding(self, text: str) -> List[float]:
         """
         Tek bir metin için embedding oluşturur.
@@ -43,10 +313,10 @@ class EmbeddingGenerator:
         if not text or not text.strip():
             raise ValueError("Boş metin için embedding oluşturulamaz")
         
-        embedding = self.embeddings.embed_query(text)
-        return embedding
+        # embed_query ile aynı ön işleme; önbellek ve inference_mode _encode yolundan gelir
+        return self._embed_texts([text])[0].tolist()
     
-    def generate_embeddings_batch(self, texts: List[str], show_progress: bool = True) -> List[List[float]]:
+    def generate_embeddings_batch(self, texts: List[str], show_progress: bool = True) -> np.ndarray:
         """
         Birden fazla metin için batch embedding oluşturur.
         
@@ -55,10 +325,10 @@ class EmbeddingGenerator:
             show_progress: İlerleme çubuğu göster (LangChain'de desteklenmiyor, parametre korunuyor)
             
         Returns:
-            List[List[float]]: Embedding vektörleri listesi
+            np.ndarray: Embedding matrisi (N x D, float32, C-contiguous)
         """
         if not texts:
-            return []
+            return np.empty((0, self.get_embedding_dimension()), dtype=np.float32)
         
         # Boş metinleri filtrele
         valid_texts = [text for text in texts if text and text.strip()]
@@ -67,29 +337,33 @@ class EmbeddingGenerator:
         
         logger.info(f"{len(valid_texts)} metin için embedding oluşturuluyor...")
         
-        # LangChain'in embed_documents metodunu kullan
-        embeddings = self.embeddings.embed_documents(valid_texts)
+        # Tekrar eden metinler bir kez encode edilir
+        embeddings = self._embed_texts(valid_texts)
         
         logger.info(f"{len(embeddings)} embedding oluşturuldu")
         return embeddings
     
     def get_embedding_dimension(self) -> int:
         """
-        Embedding vektörünün boyutunu döndürür.
+        Embedding vektörünün boyutunu döndürür (model çalıştırılmadan, ilk çağrıda önbelleğe alınır).
         
         Returns:
             int: Vektör boyutu
         """
-        # Test embedding ile boyutu öğren
-        test_embedding = self.generate_embedding("test")
-        return len(test_embedding)
+        if self._dimension is None:
+            self._dimension = self.embeddings.client.get_sentence_embedding_dimension()
+            if self._dimension is None:
+                # Model boyutu bildirmiyorsa test embedding ile öğren
+                self._dimension = len(self.generate_embedding("test"))
+        return self._dimension
     
     def get_langchain_embeddings(self) -> Embeddings:
         """
         LangChain Embeddings objesini döndürür (VectorStore için).
+        Doküman embedding'leri tekrar eden metinler atlanarak üretilir.
         
         Returns:
             Embeddings: LangChain Embeddings objesi
         """
-        return self.embeddings
+        return self._langchain_embeddings
 
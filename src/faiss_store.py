@@ -0,0 +1,566 @@
+"""
+FAISS Vektör Veritabanı Modülü
+Küçük/orta boyutlu collection'lar için FAISS IndexFlatIP ile vektör saklama ve arama.
+LangChain FAISS wrapper kullanır, VectorStore (ChromaDB) ile aynı arayüzü sunar.
+"""
+
+import asyncio
+import os
+import shutil
+from typing import Any, List, Dict, Optional, Sequence, Set
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain.schema import Document
+from langchain.embeddings.base import Embeddings
+from .vector_store import _StoreRetriever, document_id
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index"
+# Index'in yanında saklanan vektör sayısı; list_collections index'leri açmadan okur
+COUNT_FILE = f"{INDEX_NAME}.count"
+
+# Sıkıştırılmış index eğitim örnekleri: SQ8 boyut başına min/max'ı bu kadar vektörden
+# kalibre eder, IVF-PQ liste başına en fazla bu kadar vektör kullanır
+SQ8_TRAIN_SIZE = 50_000
+IVFPQ_TRAIN_PER_LIST = 64
+
+
+class FaissVectorStore:
+    """
+    FAISS vektör veritabanı yöneticisi - LangChain FAISS wrapper
+    
+    Her collection persist_directory altında ayrı bir klasörde saklanır.
+    Embedding'ler L2-normalize olduğu için (EmbeddingGenerator normalize_embeddings=True)
+    IndexFlatIP'nin iç çarpımı cosine benzerliğine eşittir.
+    
+    Collection compress_min_vectors'a ulaşınca index sıkıştırılabilir:
+    - index_type="sq8": boyut başına 8 bit scalar quantization (min/max kalibrasyonu),
+      bellek 4 kat azalır, sonuçlar tam aramaya çok yakındır.
+    - index_type="ivfpq": IVF-PQ (IndexIVFPQFastScan, vektör başına dim/16 byte), bellek
+      ~32 kat azalır ve arama sadece nprobe listeyi tarar, ancak sonuçlar yaklaşıktır
+      (recall nprobe ile artar).
+    """
+    
+    def __init__(
+        self,
+        persist_directory: str = "./data/faiss_db",
+        collection_name: str = "pdf_collection",
+        embeddings: Optional[Embeddings] = None,
+        batch_size: int = 512,
+        index_type: str = "flat",
+        compress_min_vectors: int = 100_000,
+        nprobe: int = 32,
+        indexed_fields: Sequence[str] = ("source_file", "page")
+    ):
+        """
+        Args:
+            persist_directory: FAISS index'lerinin kalıcı depolama dizini
+            collection_name: Collection adı
+            embeddings: LangChain Embeddings objesi (opsiyonel, sonra set edilebilir)
+            batch_size: add_documents'ta tek seferde eklenecek doküman sayısı
+            index_type: "flat" (tam arama), "sq8" veya "ivfpq" (sıkıştırılmış index)
+            compress_min_vectors: Sıkıştırılmış index'e dönüşüm için minimum vektör sayısı
+                (altında IndexFlatIP hem tam hem yeterince hızlıdır)
+            nprobe: IVF-PQ aramasında taranan liste sayısı
+            indexed_fields: Filtreli aramalarda ters index'le (değer -> index pozisyonları)
+                çözülen metadata alanları
+        """
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self._embeddings = embeddings
+        self.batch_size = batch_size
+        self.index_type = index_type
+        self.compress_min_vectors = compress_min_vectors
+        self.nprobe = nprobe
+        self.indexed_fields = tuple(indexed_fields)
+        # (version, alan -> değer -> pozisyonlar); içerik değişince yeniden kurulur
+        self._metadata_index = None
+        # İçerik her değiştiğinde artar; sorgu önbellekleri bununla geçersiz kılınır
+        self.version = 0
+        self._dimension = None
+        
+        # Dizini oluştur
+        os.makedirs(persist_directory, exist_ok=True)
+        
+        self.vectorstore = self._load_or_create() if embeddings else None
+        
+        logger.info(f"FaissVectorStore başlatıldı: {collection_name}")
+    
+    def _collection_path(self, collection_name: str) -> str:
+        """Collection'ın saklandığı klasör yolu"""
+        return os.path.join(self.persist_directory, collection_name)
+    
+    def _load_or_create(self) -> FAISS:
+        """Aktif collection'ı diskten yükler, yoksa boş bir IndexFlatIP oluşturur"""
+        path = self._collection_path(self.collection_name)
+        if os.path.exists(os.path.join(path, f"{INDEX_NAME}.faiss")):
+            # Pickle dosyası bu uygulamanın kendi yazdığı dosya
+            store = FAISS.load_local(
+                path,
+                self._embeddings,
+                index_name=INDEX_NAME,
+                allow_dangerous_deserialization=True,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+            if hasattr(store.index, 'nprobe'):
+                store.index.nprobe = self.nprobe
+            return store
+        
+        faiss = dependable_faiss_import()
+        if self._dimension is None:
+            self._dimension = len(self._embeddings.embed_query("dimension"))
+        return FAISS(
+            embedding_function=self._embeddings,
+            index=faiss.IndexFlatIP(self._dimension),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
+    def _maybe_compress(self):
+        """
+        index_type "sq8" veya "ivfpq" ise ve flat index compress_min_vectors'a ulaştıysa
+        index'i sıkıştırılmış index'e dönüştürür. Vektörler flat index'ten okunur
+        (yeniden embed edilmez), sıra ve docstore ID'leri korunur.
+        """
+        faiss = dependable_faiss_import()
+        index = self.vectorstore.index
+        if (
+            self.index_type not in ("sq8", "ivfpq")
+            or not isinstance(index, faiss.IndexFlat)
+            or index.ntotal < self.compress_min_vectors
+        ):
+            return
+        
+        vectors = index.reconstruct_n(0, index.ntotal)
+        dimension = index.d
+        if self.index_type == "sq8":
+            logger.info(f"FAISS index SQ8'e dönüştürülüyor ({index.ntotal} vektör)...")
+            compressed = faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+            sample_size = min(len(vectors), SQ8_TRAIN_SIZE)
+        else:
+            nlist = min(65536, int(4 * np.sqrt(index.ntotal)))
+            # Alt vektör başına 8 boyut (4 bit kod); boyutu bölen en yakın alt vektör sayısı
+            num_subquantizers = next(m for m in range(max(1, dimension // 8), 0, -1) if dimension % m == 0)
+            logger.info(
+                f"FAISS index IVF-PQ'ya dönüştürülüyor ({index.ntotal} vektör, nlist={nlist}, m={num_subquantizers})..."
+            )
+            compressed = faiss.IndexIVFPQFastScan(
+                faiss.IndexFlatIP(dimension), dimension, nlist, num_subquantizers, 4, faiss.METRIC_INNER_PRODUCT
+            )
+            compressed.nprobe = self.nprobe
+            sample_size = min(len(vectors), IVFPQ_TRAIN_PER_LIST * nlist)
+        
+        rng = np.random.default_rng(0)
+        compressed.train(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+        compressed.add(vectors)
+        self.vectorstore.index = compressed
+    
+    def _delete(self, doc_ids: List[str]):
+        """
+        Dokümanları index'ten ve docstore'dan siler.
+        
+        LangChain FAISS.delete remove_ids'ten sonra kalan pozisyonları 0..n-1 olarak
+        yeniden numaralar. Flat/SQ8 index'ler satırları kaydırdığından bu doğrudur;
+        IVF index'ler ise kalan vektörlerin etiketlerini değiştirmez. IVF'de etiketler
+        silinen pozisyonlar kadar geri kaydırılır, yoksa silinen satırdan sonraki her
+        vektör başka bir dokümana işaret eder.
+        
+        Args:
+            doc_ids: Silinecek docstore ID'leri
+        """
+        faiss = dependable_faiss_import()
+        index = self.vectorstore.index
+        if not isinstance(index, faiss.IndexIVF):
+            self.vectorstore.delete(doc_ids)
+            return
+        
+        targets = set(doc_ids)
+        removed = np.sort(np.fromiter(
+            (position for position, doc_id in self.vectorstore.index_to_docstore_id.items() if doc_id in targets),
+            dtype=np.int64
+        ))
+        self.vectorstore.delete(doc_ids)
+        
+        invlists = index.invlists
+        for list_no in range(index.nlist):
+            size = invlists.list_size(list_no)
+            if size:
+                # get_ids listenin kendi etiket dizisini döndürür, yerinde güncellenir
+                labels = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+                labels -= np.searchsorted(removed, labels)
+    
+    def _save(self):
+        """Aktif collection'ı (ve vektör sayısını) diske yazar"""
+        path = self._collection_path(self.collection_name)
+        self.vectorstore.save_local(path, index_name=INDEX_NAME)
+        with open(os.path.join(path, COUNT_FILE), 'w') as f:
+            f.write(str(self.vectorstore.index.ntotal))
+    
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        """Sorguları embed eden LangChain Embeddings objesi"""
+        return self._embeddings
+    
+    def set_embeddings(self, embeddings: Embeddings):
+        """Embeddings'i set et (lazy initialization için)"""
+        self._embeddings = embeddings
+        self._dimension = None
+        self.version += 1
+        self.vectorstore = self._load_or_create()
+        logger.info("Embeddings set edildi")
+    
+    def add_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ):
+        """
+        LangChain Document objelerini FAISS index'ine ekler ve diske yazar.
+        Aynı ID ile aynı içerik ve metadata zaten kayıtlıysa doküman atlanır;
+        değişen ID'ler önce silinir (Chroma upsert davranışıyla aynı).
+        
+        Args:
+            documents: LangChain Document listesi
+            ids: Özel ID'ler (opsiyonel, verilmezse içerikten üretilir)
+        """
+        if not documents:
+            raise ValueError("Documents boş olamaz")
+        
+        if not self.vectorstore:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        if not ids:
+            ids = [document_id(doc) for doc in documents]
+        
+        known_ids = set(self.vectorstore.index_to_docstore_id.values())
+        docstore = self.vectorstore.docstore
+        new = []
+        for doc, doc_id in zip(documents, ids):
+            if doc_id in known_ids:
+                stored = docstore.search(doc_id)
+                if stored.page_content == doc.page_content and stored.metadata == doc.metadata:
+                    continue
+            new.append((doc, doc_id))
+        if len(new) < len(documents):
+            logger.info(f"{len(documents) - len(new)} doküman zaten kayıtlı, atlandı")
+        if not new:
+            return
+        documents = [doc for doc, _ in new]
+        ids = [doc_id for _, doc_id in new]
+        
+        logger.info(f"{len(documents)} doküman ekleniyor...")
+        
+        existing = [doc_id for doc_id in ids if doc_id in known_ids]
+        if existing:
+            self._delete(existing)
+        
+        for start in range(0, len(documents), self.batch_size):
+            end = start + self.batch_size
+            self.vectorstore.add_documents(documents=documents[start:end], ids=ids[start:end])
+        
+        self._maybe_compress()
+        self._save()
+        self.version += 1
+        logger.info(f"{len(documents)} doküman eklendi")
+    
+    async def aadd_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ):
+        """
+        add_documents metodunun async versiyonu.
+        Embedding'ler yerel modelde üretildiğinden (HTTP çağrısı yok) eşzamanlı batch'ler
+        hız kazandırmaz; ekleme thread'de çalışır, event loop bloklanmaz.
+        
+        Args:
+            documents: LangChain Document listesi
+            ids: Özel ID'ler (opsiyonel, verilmezse içerikten üretilir)
+        """
+        await asyncio.to_thread(self.add_documents, documents, ids)
+    
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict] = None
+    ) -> List[tuple]:
+        """
+        LangChain'in similarity_search_with_score metodunu kullanır.
+        
+        Args:
+            query: Sorgu metni
+            k: Döndürülecek en iyi sonuç sayısı
+            filter: Metadata filtresi (opsiyonel)
+            
+        Returns:
+            List[tuple]: (Document, score) tuple listesi (score: iç çarpım, yüksek = benzer)
+        """
+        if not self.vectorstore:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        return self.similarity_search_by_vector_with_score(self._embeddings.embed_query(query), k=k, filter=filter)
+    
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filter: Optional[Dict] = None
+    ) -> List[tuple]:
+        """
+        Hazır sorgu embedding'iyle arama yapar (soru tekrar embed edilmez).
+        
+        Args:
+            embedding: Sorgu embedding'i
+            k: Döndürülecek en iyi sonuç sayısı
+            filter: Metadata filtresi (opsiyonel)
+            
+        Returns:
+            List[tuple]: (Document, score) tuple listesi (score: iç çarpım, yüksek = benzer)
+        """
+        if not self.vectorstore:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        if isinstance(filter, dict) and filter:
+            # LangChain FAISS filtreyi ilk fetch_k (20) aday üzerinde uygular; eşleşen
+            # dokümanlar daha aşağıdaysa eksik sonuç döner. Filtre index aramasına verilir.
+            queries = np.asarray([embedding], dtype=np.float32)
+            return self._search_index(queries, k, filter)[0]
+        
+        return self.vectorstore.similarity_search_with_score_by_vector(list(embedding), k=k, filter=filter)
+    
+    async def asimilarity_search(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        """
+        Birden fazla sorguyu eşzamanlı arar (multi-query/HyDE gibi fan-out'lar için).
+        Her arama ayrı thread'de çalışır; FAISS araması sırasında GIL'i
+        bıraktığından aramalar gerçekten paralel yürür ve event loop bloklanmaz.
+        
+        Args:
+            queries: Sorgu metinleri
+            k: Sorgu başına döndürülecek en iyi sonuç sayısı
+            filter: Metadata filtresi (opsiyonel, tüm sorgulara uygulanır)
+            
+        Returns:
+            List[List[tuple]]: Sorgu sırasıyla (Document, score) tuple listeleri
+        """
+        return await asyncio.gather(*(
+            asyncio.to_thread(self.similarity_search_with_score, query, k, filter)
+            for query in queries
+        ))
+    
+    def _positions_for_value(self, field: str, value: Any) -> Set[int]:
+        """Ters index'te alanın değere (veya değer listesine) eşit olduğu pozisyonlar"""
+        values = value if isinstance(value, list) else [value]
+        field_index = self._metadata_index[1][field]
+        positions = set()
+        for item in values:
+            try:
+                positions |= field_index.get(item, set())
+            except TypeError:
+                # Hash'lenemeyen filtre değeri hiçbir kayıtla eşleşmez
+                continue
+        return positions
+    
+    def _filter_positions(self, filter: Dict) -> np.ndarray:
+        """
+        Metadata filtresine (eşitlik veya değer listesi) uyan index pozisyonlarını döndürür.
+        indexed_fields'teki alanlar ters index'ten, diğerleri docstore taramasıyla çözülür.
+        """
+        if self._metadata_index is None or self._metadata_index[0] != self.version:
+            field_indexes = {field: {} for field in self.indexed_fields}
+            docstore = self.vectorstore.docstore
+            for position, doc_id in self.vectorstore.index_to_docstore_id.items():
+                metadata = docstore.search(doc_id).metadata
+                for field, field_index in field_indexes.items():
+                    try:
+                        field_index.setdefault(metadata.get(field), set()).add(position)
+                    except TypeError:
+                        continue
+            self._metadata_index = (self.version, field_indexes)
+        
+        positions = None
+        rest = {}
+        for field, value in filter.items():
+            if field in self.indexed_fields:
+                matched = self._positions_for_value(field, value)
+                positions = matched if positions is None else positions & matched
+            else:
+                rest[field] = value
+        
+        if positions is None:
+            positions = self.vectorstore.index_to_docstore_id.keys()
+        if rest:
+            matches = FAISS._create_filter_func(rest)
+            docstore = self.vectorstore.docstore
+            id_map = self.vectorstore.index_to_docstore_id
+            positions = [p for p in positions if matches(docstore.search(id_map[p]).metadata)]
+        return np.fromiter(positions, dtype=np.int64, count=len(positions))
+    
+    def _search_index(self, queries: np.ndarray, k: int, filter: Optional[Dict] = None) -> List[List[tuple]]:
+        """
+        Sorgu vektörlerini tek index.search çağrısıyla arar.
+        Filtre verilirse sadece filtreye uyan pozisyonlar taranır (IDSelector).
+        
+        Returns:
+            List[List[tuple]]: Sorgu başına (Document, score) listeleri
+        """
+        faiss = dependable_faiss_import()
+        params = None
+        if filter:
+            positions = self._filter_positions(filter)
+            if len(positions) == 0:
+                return [[] for _ in queries]
+            selector = faiss.IDSelectorBatch(positions)
+            if hasattr(self.vectorstore.index, 'nprobe'):
+                # Eşleşen vektörler taranmayan listelerde kalmasın diye tüm listeler taranır
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=self.vectorstore.index.nlist)
+            else:
+                params = faiss.SearchParameters(sel=selector)
+        
+        scores, indices = self.vectorstore.index.search(queries, k, params=params)
+        id_map = self.vectorstore.index_to_docstore_id
+        docstore = self.vectorstore.docstore
+        return [
+            [
+                (docstore.search(id_map[i]), float(score))
+                for score, i in zip(row_scores, row_indices)
+                if i != -1
+            ]
+            for row_scores, row_indices in zip(scores, indices)
+        ]
+    
+    def batch_search(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filter_metadata: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Birden fazla sorgu embedding'ini tek index.search çağrısıyla arar.
+        
+        Args:
+            query_embeddings: Sorgu embedding vektörleri
+            top_k: Sorgu başına döndürülecek en iyi sonuç sayısı
+            filter_metadata: Metadata filtresi (opsiyonel, tüm sorgulara uygulanır)
+            
+        Returns:
+            List[List[Dict]]: Sorgu sırasıyla {'text', 'metadata', 'distance', 'similarity'} listeleri
+                (similarity = iç çarpım, distance = 1 - similarity)
+        """
+        if not self.vectorstore:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        if len(query_embeddings) == 0:
+            return []
+        
+        queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        hits = self._search_index(queries, top_k, filter_metadata)
+        
+        return [
+            [
+                {'text': doc.page_content, 'metadata': doc.metadata, 'distance': 1.0 - score, 'similarity': score}
+                for doc, score in row
+            ]
+            for row in hits
+        ]
+    
+    @staticmethod
+    def scores_to_similarity(scores: np.ndarray) -> np.ndarray:
+        """İç çarpım skorları normalize vektörlerde zaten cosine benzerliğidir (IVF-PQ'da yaklaşık)"""
+        return scores
+    
+    def get_collection_info(self) -> Dict:
+        """Collection hakkında bilgi döndürür"""
+        count = self.vectorstore.index.ntotal if self.vectorstore else 0
+        return {
+            'collection_name': self.collection_name,
+            'document_count': count,
+            'persist_directory': self.persist_directory
+        }
+    
+    def reset_collection(self):
+        """Collection'ı sıfırlar (tüm dokümanları siler)"""
+        self.delete_collection()
+        logger.info("Collection sıfırlandı")
+    
+    def delete_collection(self):
+        """Collection'ı siler (embeddings set edilmişse yerine boş bir index açılır)"""
+        try:
+            shutil.rmtree(self._collection_path(self.collection_name), ignore_errors=True)
+            self.vectorstore = self._load_or_create() if self._embeddings else None
+            self.version += 1
+            logger.info(f"Collection silindi: {self.collection_name}")
+        except Exception as e:
+            logger.error(f"Collection silinirken hata: {e}")
+    
+    def list_collections(self) -> List[Dict]:
+        """Tüm collection'ları listeler"""
+        try:
+            faiss = dependable_faiss_import()
+            
+            result = []
+            for name in sorted(os.listdir(self.persist_directory)):
+                index_path = os.path.join(self._collection_path(name), f"{INDEX_NAME}.faiss")
+                if not os.path.exists(index_path):
+                    continue
+                try:
+                    count_path = os.path.join(self._collection_path(name), COUNT_FILE)
+                    if name == self.collection_name and self.vectorstore:
+                        count = self.vectorstore.index.ntotal
+                    elif os.path.exists(count_path):
+                        with open(count_path) as f:
+                            count = int(f.read())
+                    else:
+                        # Sayı dosyası olmayan eski collection'lar: index okunur
+                        count = faiss.read_index(index_path).ntotal
+                    result.append({
+                        'name': name,
+                        'count': count
+                    })
+                except Exception as e:
+                    logger.warning(f"Collection {name} bilgisi alınamadı: {e}")
+            return result
+        except Exception as e:
+            logger.error(f"Collection listesi alınamadı: {e}")
+            return []
+    
+    def switch_collection(self, collection_name: str):
+        """Aktif collection'ı değiştirir"""
+        self.collection_name = collection_name
+        if self._embeddings:
+            self.vectorstore = self._load_or_create()
+        self.version += 1
+        logger.info(f"Collection değiştirildi: {collection_name}")
+    
+    def as_retriever(self, **kwargs):
+        """
+        LangChain retriever oluşturur (Chains için gerekli).
+        
+        Args:
+            **kwargs: Retriever parametreleri (search_kwargs, vb.)
+            
+        Returns:
+            VectorStoreRetriever: LangChain retriever objesi
+        """
+        if not self.vectorstore:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        if set(kwargs) <= {"search_kwargs"}:
+            # score_threshold desteği için VectorStore ile aynı retriever
+            return _StoreRetriever(vector_store=self, search_kwargs=kwargs.get("search_kwargs", {}))
+        
+        return self.vectorstore.as_retriever(**kwargs)
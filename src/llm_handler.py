@@ -4,15 +4,131 @@ Ollama ile lokal LLM işlemleri.
 LangChain Ollama wrapper kullanır.
 """
 
-from typing import Optional, Iterator, Union
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Optional, Iterator, Union
+import requests
+from requests.adapters import HTTPAdapter
 from langchain_community.llms import Ollama
+from langchain_community.llms import ollama as _ollama_module
 from langchain_community.chat_models import ChatOllama
+from langchain_core.outputs import LLMResult
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """Ollama istekleri için keep-alive bağlantı havuzlu, process genelinde paylaşılan Session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Sadece _PooledSessionMixin._create_stream içinde True; proxy kurulu olduğu sürece
+# aynı anda gelen diğer Ollama kullanımlarını etkilemez
+_USE_POOLED_SESSION: ContextVar[bool] = ContextVar("use_pooled_session", default=False)
+
+# Proxy'yi kullanan aktif _create_stream çağrısı sayısı; son çağrı bitince modül eski haline döner
+_PATCH_LOCK = threading.Lock()
+_patch_depth = 0
+_original_requests: Any = None
+
+
+class _PooledRequests:
+    """
+    _create_stream süresince langchain_community Ollama modülündeki requests yerine konan ince proxy.
+    _PooledSessionMixin çağrılarında post paylaşılan Session'a gider; diğer tüm
+    çağrılar ve öznitelikler gerçek requests modülüne aynen devredilir.
+    """
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(requests, name)
+    
+    def post(self, *args: Any, **kwargs: Any) -> requests.Response:
+        if _USE_POOLED_SESSION.get():
+            return _get_session().post(*args, **kwargs)
+        return requests.post(*args, **kwargs)
+
+
+_POOLED_REQUESTS = _PooledRequests()
+
+
+@contextmanager
+def _pooled_transport() -> Iterator[None]:
+    """Ollama modülünün requests'ini blok süresince paylaşılan Session'a yönlendirir"""
+    global _patch_depth, _original_requests
+    with _PATCH_LOCK:
+        if _patch_depth == 0:
+            _original_requests = _ollama_module.requests
+            _ollama_module.requests = _POOLED_REQUESTS
+        _patch_depth += 1
+    token = _USE_POOLED_SESSION.set(True)
+    try:
+        yield
+    finally:
+        _USE_POOLED_SESSION.reset(token)
+        with _PATCH_LOCK:
+            _patch_depth -= 1
+            if _patch_depth == 0:
+                _ollama_module.requests = _original_requests
+                _original_requests = None
+
+
+class _PooledSessionMixin:
+    """
+    LangChain Ollama wrapper'larının senkron isteklerini paylaşılan Session üzerinden gönderir.
+    Orijinal _create_stream her çağrıda requests.post ile yeni TCP bağlantısı açar; istek
+    gövdesi ve hata işleme LangChain'de kalır, sadece çağrı süresince taşıma katmanı değişir.
+    """
+    
+    def _create_stream(self, *args: Any, **kwargs: Any) -> Iterator[str]:
+        with _pooled_transport():
+            return super()._create_stream(*args, **kwargs)
+
+
+class _PooledChatOllama(_PooledSessionMixin, ChatOllama):
+    """Bağlantı havuzu kullanan ChatOllama"""
+
+
+class _ConcurrentOllama(_PooledSessionMixin, Ollama):
+    """
+    Async çağrılarda birden fazla prompt'u eşzamanlı gönderen Ollama wrapper'ı.
+    LangChain'in Ollama._agenerate metodu prompt'ları sırayla bekler; map_reduce gibi
+    chain'lerde doküman başına prompt'lar bu sayede paralel işlenir.
+    Ollama sunucusunun istekleri paralel işlemesi için OLLAMA_NUM_PARALLEL ayarlanmalıdır.
+    Senkron istekler paylaşılan bağlantı havuzu üzerinden gönderilir.
+    """
+    
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        images: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        chunks = await asyncio.gather(*[
+            self._astream_with_aggregation(
+                prompt,
+                stop=stop,
+                images=images,
+                run_manager=run_manager,
+                verbose=self.verbose,
+                **kwargs,
+            )
+            for prompt in prompts
+        ])
+        return LLMResult(generations=[[chunk] for chunk in chunks])
+
+
 class OllamaLLMHandler:
     """Ollama LLM yöneticisi - LangChain Ollama wrapper"""
     
@@ -23,7 +139,8 @@ class OllamaLLMHandler:
         temperature: float = 0.7,
         max_tokens: int = 1000,
         timeout: int = 30,
-        use_chat: bool = False
+        use_chat: bool = False,
+        keep_alive: Optional[Union[int, str]] = "30m"
     ):
         """
         Args:
@@ -33,29 +150,35 @@ class OllamaLLMHandler:
             max_tokens: Maksimum token sayısı
             timeout: Request timeout (saniye)
             use_chat: ChatOllama kullan (True) veya Ollama kullan (False)
+            keep_alive: Modelin son istekten sonra bellekte kalma süresi ("30m", saniye,
+                -1: süresiz). Model yüklü kaldıkça Ollama ortak prompt öneklerinin
+                (talimatlar + aynı chunk'lar) KV cache'ini yeniden kullanır.
         """
         self.model_name = model_name
         self.base_url = base_url.rstrip('/')
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.timeout = timeout
+        self.keep_alive = keep_alive
         
         # LangChain Ollama wrapper'ı başlat
         if use_chat:
-            self.llm = ChatOllama(
+            self.llm = _PooledChatOllama(
                 model=model_name,
                 base_url=base_url,
                 temperature=temperature,
                 num_predict=max_tokens,
-                timeout=timeout
+                timeout=timeout,
+                keep_alive=keep_alive
             )
         else:
-            self.llm = Ollama(
+            self.llm = _ConcurrentOllama(
                 model=model_name,
                 base_url=base_url,
                 temperature=temperature,
                 num_predict=max_tokens,
-                timeout=timeout
+                timeout=timeout,
+                keep_alive=keep_alive
             )
         
         logger.info(f"Ollama LLM başlatıldı: {model_name} ({'Chat' if use_chat else 'LLM'})")
@@ -63,7 +186,8 @@ class OllamaLLMHandler:
     def generate(
         self,
         prompt: str,
-        stream: bool = False
+        stream: bool = False,
+        max_tokens: Optional[int] = None
     ) -> Union[str, Iterator[str]]:
         """
         LLM'den cevap üretir.
@@ -71,30 +195,140 @@ class OllamaLLMHandler:
         Args:
             prompt: Gönderilecek prompt
             stream: Streaming response isteniyorsa True
+            max_tokens: Bu çağrı için maksimum token sayısı (None: handler ayarı)
             
         Returns:
             str veya Iterator[str]: Cevap metni veya streaming iterator
         """
+        kwargs = {} if max_tokens is None else {'num_predict': max_tokens}
         try:
             if stream:
-                # Streaming response
-                return self.llm.stream(prompt)
+                # Streaming response (chat modelinde chunk'lar metne çevrilir)
+                return (self._to_text(chunk) for chunk in self.llm.stream(prompt, **kwargs))
             else:
                 # Normal response
-                return self.llm.invoke(prompt)
+                return self._to_text(self.llm.invoke(prompt, **kwargs))
                 
         except Exception as e:
             logger.error(f"LLM çağrısı başarısız: {e}")
             raise
     
+    async def agenerate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """
+        LLM'den async olarak cevap üretir.
+        
+        Args:
+            prompt: Gönderilecek prompt
+            max_tokens: Bu çağrı için maksimum token sayısı (None: handler ayarı)
+            
+        Returns:
+            str: Cevap metni
+        """
+        kwargs = {} if max_tokens is None else {'num_predict': max_tokens}
+        try:
+            return self._to_text(await self.llm.ainvoke(prompt, **kwargs))
+        except Exception as e:
+            logger.error(f"LLM çağrısı başarısız: {e}")
+            raise
+    
+    async def astream(self, prompt: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        LLM cevabını async olarak parça parça döndürür.
+        
+        Args:
+            prompt: Gönderilecek prompt
+            max_tokens: Bu çağrı için maksimum token sayısı (None: handler ayarı)
+            
+        Yields:
+            str: Cevap parçaları
+        """
+        kwargs = {} if max_tokens is None else {'num_predict': max_tokens}
+        try:
+            async for chunk in self.llm.astream(prompt, **kwargs):
+                yield self._to_text(chunk)
+        except Exception as e:
+            logger.error(f"LLM çağrısı başarısız: {e}")
+            raise
+    
+    def generate_batch(self, prompts: List[str], max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        Birden fazla prompt'u eşzamanlı gönderir (thread havuzu + paylaşılan bağlantı havuzu).
+        Ollama OLLAMA_NUM_PARALLEL ile istekleri aynı anda işleyebilir.
+        
+        Args:
+            prompts: Prompt listesi
+            max_concurrency: Aynı anda gönderilecek maksimum istek sayısı (None: sınırsız)
+            
+        Returns:
+            List[str]: Prompt sırasıyla cevap metinleri
+        """
+        try:
+            results = self.llm.batch(prompts, config={"max_concurrency": max_concurrency})
+            return [self._to_text(result) for result in results]
+        except Exception as e:
+            logger.error(f"LLM batch çağrısı başarısız: {e}")
+            raise
+    
+    async def agenerate_batch(self, prompts: List[str], max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        generate_batch metodunun async versiyonu (istekler asyncio.gather ile eşzamanlı).
+        
+        Args:
+            prompts: Prompt listesi
+            max_concurrency: Aynı anda gönderilecek maksimum istek sayısı (None: sınırsız)
+            
+        Returns:
+            List[str]: Prompt sırasıyla cevap metinleri
+        """
+        try:
+            results = await self.llm.abatch(prompts, config={"max_concurrency": max_concurrency})
+            return [self._to_text(result) for result in results]
+        except Exception as e:
+            logger.error(f"LLM batch çağrısı başarısız: {e}")
+            raise
+    
+    @staticmethod
+    def _to_text(result: Any) -> str:
+        """LLM (str) ve chat model (AIMessage) çıktısını metne çevirir"""
+        return result if isinstance(result, str) else result.content
+    
+    def warmup(self):
+        """
+        Modeli Ollama'da belleğe yükletmek için 1 token'lık bir istek gönderir.
+        İlk kullanıcı sorusunun model yükleme süresini beklememesi için başlangıçta çağrılır.
+        Hatalar sadece loglanır.
+        """
+        try:
+            self.llm.invoke("ping", num_predict=1)
+            logger.info(f"Ollama modeli hazır: {self.model_name}")
+        except Exception as e:
+            logger.warning(f"Ollama ısınma isteği başarısız: {e}")
+    
     def test_connection(self) -> bool:
-        """Ollama bağlantısını test eder"""
+        """
+        Ollama bağlantısını ve modelin yüklü olduğunu /api/tags ile kontrol eder
+        (model çalıştırılmaz, token üretilmez).
+        
+        Returns:
+            bool: Sunucu erişilebilir ve model yüklü ise True
+        """
         try:
-            # Basit bir test çağrısı yap
-            test_response = self.llm.invoke("test")
-            return test_response is not None
+            response = _get_session().get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            response.raise_for_status()
+            models = response.json().get('models', [])
         except Exception:
             return False
+        
+        # Etiketsiz model adları Ollama'da ":latest" olarak listelenir
+        wanted = (self.model_name, f"{self.model_name}:latest")
+        if any(model.get('name') in wanted for model in models):
+            return True
+        
+        logger.warning(
+            f"Model bulunamadı: {self.model_name} "
+            f"(yüklü modeller: {', '.join(model.get('name', '?') for model in models)})"
+        )
+        return False
     
     def get_langchain_llm(self):
         """
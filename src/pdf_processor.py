@@ -5,25 +5,100 @@ LangChain Document Loader kullanır.
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Optional
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document
+from pypdf import PdfReader
 import logging
 
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Worker başına düşen minimum sayfa sayısı (küçük PDF'lerde process açmaya değmez)
+MIN_PAGES_PER_WORKER = 10
+
+
+def _load_page_range(file_path: str, start: int, end: int) -> List[Document]:
+    """
+    PDF'in [start, end) aralığındaki sayfalarını Document olarak yükler.
+    Metin PDFium (C++) ile çıkarılır; pypdfium2 yoksa veya PDF açılamazsa pypdf kullanılır.
+    ProcessPoolExecutor ile pickle edilebilmesi için modül seviyesinde tanımlı.
+    """
+    if pdfium is not None:
+        try:
+            texts = _extract_texts_pdfium(file_path, start, end)
+        except pdfium.PdfiumError as e:
+            logger.warning(f"PDFium ile okunamadı, pypdf kullanılıyor: {e}")
+            texts = _extract_texts_pypdf(file_path, start, end)
+        else:
+            _fill_empty_pages_pypdf(file_path, start, texts)
+    else:
+        texts = _extract_texts_pypdf(file_path, start, end)
+    
+    return [
+        Document(page_content=text, metadata={'source': file_path, 'page': page_num})
+        for page_num, text in zip(range(start, end), texts)
+    ]
+
+
+def _extract_texts_pdfium(file_path: str, start: int, end: int) -> List[str]:
+    """Sayfa metinlerini pypdfium2 ile çıkarır"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        texts = []
+        for page_num in range(start, end):
+            page = pdf[page_num]
+            textpage = page.get_textpage()
+            # PDFium satır sonlarını \r\n olarak döndürür; pypdf ile aynı formata getir
+            texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def _fill_empty_pages_pypdf(file_path: str, start: int, texts: List[str]):
+    """
+    PDFium'un metin çıkaramadığı sayfaları pypdf ile tekrar dener (yerinde).
+    PdfReader sadece gerektiğinde ve aralık başına bir kez açılır.
+    """
+    reader = None
+    for i, text in enumerate(texts):
+        if text and not text.isspace():
+            continue
+        if reader is None:
+            reader = PdfReader(file_path)
+        try:
+            texts[i] = reader.pages[start + i].extract_text()
+        except Exception as e:
+            logger.warning(f"Sayfa {start + i} pypdf ile de okunamadı: {e}")
+
+
+def _extract_texts_pypdf(file_path: str, start: int, end: int) -> List[str]:
+    """Sayfa metinlerini pypdf ile çıkarır"""
+    reader = PdfReader(file_path)
+    return [reader.pages[page_num].extract_text() for page_num in range(start, end)]
+
 
 class PDFProcessor:
     """PDF dosyalarını işleyen sınıf"""
     
-    def __init__(self, max_file_size_mb: int = 50):
+    def __init__(self, max_file_size_mb: int = 50, max_workers: Optional[int] = None):
         """
         Args:
             max_file_size_mb: Maksimum dosya boyutu (MB)
+            max_workers: Paralel sayfa çıkarımı için process sayısı
+                (varsayılan: min(CPU sayısı, 6))
         """
         self.max_file_size_mb = max_file_size_mb
         self.max_file_size_bytes = max_file_size_mb * 1024 * 1024
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 6)
     
     def validate_pdf(self, file_path: str) -> bool:
         """
@@ -50,12 +125,16 @@ class PDFProcessor:
         
         return True
     
-    def load_documents(self, file_path: str) -> List[Document]:
+    def load_documents(self, file_path: str, total_pages: Optional[int] = None) -> List[Document]:
         """
         PDF'den LangChain Document objelerini yükler.
+        Büyük PDF'lerde sayfalar process havuzunda paralel çıkarılır; ardışık sayfa
+        aralıkları worker'lara dağıtılır, sonuçlar sayfa sırasıyla birleştirilir.
+        (PDFium thread-safe olmadığı için thread yerine process kullanılır.)
         
         Args:
             file_path: PDF dosya yolu
+            total_pages: PDF'in toplam sayfa sayısı (biliniyorsa; yoksa okunur)
             
         Returns:
             List[Document]: LangChain Document objeleri (sayfa numarası metadata ile)
@@ -63,28 +142,64 @@ class PDFProcessor:
         self.validate_pdf(file_path)
         
         try:
-            # LangChain PyPDFLoader kullan
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
+            if total_pages is None:
+                # Sadece xref/trailer okunur, sayfa metni çıkarılmaz
+                total_pages = len(PdfReader(file_path).pages)
             
-            # Sayfa numarası metadata'sını ekle
-            filename = os.path.basename(file_path)
-            for doc in documents:
-                if 'page' not in doc.metadata:
-                    # PyPDFLoader bazen page metadata eklemiyor, ekleyelim
-                    doc.metadata['source_file'] = filename
-                    doc.metadata['file_path'] = file_path
-                else:
-                    doc.metadata['source_file'] = filename
-                    doc.metadata['file_path'] = file_path
+            workers = min(self.max_workers, total_pages // MIN_PAGES_PER_WORKER)
+            if workers > 1:
+                documents = self._load_page_ranges_parallel(file_path, total_pages, workers)
+            else:
+                documents = _load_page_range(file_path, 0, total_pages)
             
-            logger.info(f"PDF yüklendi: {len(documents)} sayfa")
+            self._add_file_metadata(documents, file_path)
+            
+            logger.info(f"PDF yüklendi: {len(documents)} sayfa ({max(workers, 1)} process)")
             return documents
             
         except Exception as e:
             logger.error(f"PDF işleme hatası: {e}")
             raise
     
+    def load_documents_parallel(self, file_path: str, total_pages: int) -> List[Document]:
+        """
+        Geriye uyumluluk için korunuyor; load_documents artık büyük PDF'lerde paralel çalışır.
+        
+        Args:
+            file_path: PDF dosya yolu
+            total_pages: PDF'in toplam sayfa sayısı
+            
+        Returns:
+            List[Document]: LangChain Document objeleri
+        """
+        return self.load_documents(file_path, total_pages=total_pages)
+    
+    @staticmethod
+    def _load_page_ranges_parallel(file_path: str, total_pages: int, workers: int) -> List[Document]:
+        """Sayfaları worker sayısı kadar ardışık aralığa bölüp process havuzunda yükler"""
+        pages_per_worker = -(-total_pages // workers)
+        ranges = [
+            (start, min(start + pages_per_worker, total_pages))
+            for start in range(0, total_pages, pages_per_worker)
+        ]
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _load_page_range,
+                [file_path] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges]
+            )
+            return [doc for batch in results for doc in batch]
+    
+    @staticmethod
+    def _add_file_metadata(documents: List[Document], file_path: str):
+        """Document'lere kaynak dosya metadata'sını ekler"""
+        filename = os.path.basename(file_path)
+        for doc in documents:
+            doc.metadata['source_file'] = filename
+            doc.metadata['file_path'] = file_path
+    
     def extract_text(self, file_path: str) -> List[Dict[str, any]]:
         """
         PDF'den metin içeriğini çıkarır ve sayfa bazlı döndürür.
@@ -101,10 +216,11 @@ class PDFProcessor:
         pages_content = []
         for doc in documents:
             page_num = doc.metadata.get('page', 0)
-            if doc.page_content and doc.page_content.strip():
+            text = doc.page_content.strip() if doc.page_content else ''
+            if text:
                 pages_content.append({
                     'page': page_num,
-                    'text': doc.page_content.strip()
+                    'text': text
                 })
         
         return pages_content
@@ -122,9 +238,8 @@ class PDFProcessor:
         self.validate_pdf(file_path)
         
         try:
-            # LangChain loader ile sayfa sayısını al
-            documents = self.load_documents(file_path)
-            total_pages = len(documents)
+            # Sayfa sayısı için sadece xref/trailer okunur (sayfa metni çıkarılmaz)
+            total_pages = len(PdfReader(file_path).pages)
             file_size = os.path.getsize(file_path)
             
             return {
@@ -4,20 +4,14 @@ RAG için prompt şablonları.
 LangChain PromptTemplate kullanır.
 """
 
-from typing import List, Dict
+from typing import Any, List, Dict
 from langchain.prompts import PromptTemplate, ChatPromptTemplate
 from langchain.schema import Document
 
-
-class PromptTemplates:
-    """Prompt şablonları sınıfı - LangChain PromptTemplate kullanır"""
-    
-    def __init__(self):
-        """LangChain prompt template'lerini oluştur"""
-        # RAG için PromptTemplate
-        self.rag_template = PromptTemplate(
-            input_variables=["context", "question"],
-            template="""Aşağıdaki dokümandan elde edilen bilgilere dayanarak soruyu cevapla.
+# RAG prompt şablonu (rag_prompt ve stuff chain aynı şablonu kullanır).
+# Sabit talimatlar başta, soru sonda: LLM sunucusu (Ollama) talimat ve ortak
+# chunk'lardan oluşan önekin KV cache'ini istekler arasında yeniden kullanabilir.
+_RAG_TEMPLATE = """Aşağıdaki dokümandan elde edilen bilgilere dayanarak soruyu cevapla.
 Sadece verilen bilgileri kullan. Bilmiyorsan "Bu bilgi dokümanda yok" de.
 
 Doküman İçeriği:
@@ -26,6 +20,61 @@ Doküman İçeriği:
 Soru: {question}
 
 Cevap:"""
+
+
+# Sorunun doküman araması gerektirip gerektirmediğini soran tek kelimelik LLM yoklaması
+_RETRIEVAL_GATE_TEMPLATE = """Aşağıdaki mesajı cevaplamak için yüklenen dokümanda arama yapmak gerekir mi?
+Selamlaşma, teşekkür veya genel sohbet ise "hayır", doküman içeriğiyle ilgili bir soru ise "evet" de.
+Sadece tek kelimeyle cevap ver: evet veya hayır.
+
+Mesaj: {question}
+
+Cevap:"""
+
+# Context'teki chunk'ları ayıran metin
+_CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+def _stable_key(text: str, metadata: Dict) -> tuple:
+    """Chunk'lar için sorgudan bağımsız sıralama anahtarı (dosya, sayfa, chunk_id, metin)"""
+    page = metadata.get('page')
+    chunk_id = metadata.get('chunk_id')
+    return (
+        str(metadata.get('source_file', '')),
+        page if isinstance(page, int) else -1,
+        chunk_id if isinstance(chunk_id, int) else -1,
+        text
+    )
+
+
+def _snippet(text: str, limit: int = 200) -> str:
+    """Kaynak gösterimi için metnin ilk limit karakteri (kısaltıldıysa '...' eklenir)"""
+    return text[:limit] + ('...' if len(text) > limit else '')
+
+
+class CompiledPromptTemplate(PromptTemplate):
+    """
+    Sabit f-string şablonları için PromptTemplate.
+    LangChain'in Python seviyesindeki string.Formatter yolu yerine şablonu
+    doğrudan C seviyesindeki str.format ile doldurur (çıktı aynıdır).
+    Chain'ler prompt'u format() üzerinden oluşturduğu için her çağrıda geçerlidir.
+    """
+    
+    def format(self, **kwargs: Any) -> str:
+        if self.partial_variables:
+            kwargs = self._merge_partial_and_user_variables(**kwargs)
+        return self.template.format(**kwargs)
+
+
+class PromptTemplates:
+    """Prompt şablonları sınıfı - LangChain PromptTemplate kullanır"""
+    
+    def __init__(self):
+        """LangChain prompt template'lerini oluştur"""
+        # RAG için PromptTemplate
+        self.rag_template = CompiledPromptTemplate(
+            input_variables=["context", "question"],
+            template=_RAG_TEMPLATE
         )
         
         # Chat için ChatPromptTemplate
@@ -45,7 +94,19 @@ Cevap:"""
         Returns:
             str: Formatlanmış prompt
         """
-        return self.rag_template.format(context=context, question=question)
+        return _RAG_TEMPLATE.format(context=context, question=question)
+    
+    def retrieval_gate_prompt(self, question: str) -> str:
+        """
+        Retrieval gerekliliği yoklaması için prompt.
+        
+        Args:
+            question: Kullanıcı sorusu
+            
+        Returns:
+            str: Formatlanmış prompt (beklenen cevap: "evet" veya "hayır")
+        """
+        return _RETRIEVAL_GATE_TEMPLATE.format(question=question)
     
     def get_rag_template(self) -> PromptTemplate:
         """
@@ -66,36 +127,64 @@ Cevap:"""
         return self.chat_template
     
     @staticmethod
-    def format_context(chunks: List[Dict], include_metadata: bool = True) -> str:
+    def stable_document_order(documents: List[Document]) -> List[Document]:
+        """
+        Dokümanları benzerlik sırası yerine doküman içindeki konumlarına göre sıralar.
+        Aynı chunk'lar her sorguda aynı sırada ve aynı token dizisiyle prompt'a girer;
+        ortak önek LLM sunucusunun prefix (KV) cache'inden gelir.
+        
+        Args:
+            documents: LangChain Document listesi
+            
+        Returns:
+            List[Document]: Sıralanmış liste
+        """
+        return sorted(documents, key=lambda doc: _stable_key(doc.page_content, doc.metadata))
+    
+    @staticmethod
+    def format_context(
+        chunks: List[Dict],
+        include_metadata: bool = True,
+        stable_order: bool = False
+    ) -> str:
         """
         Retrieved chunk'ları context formatına dönüştürür.
         
         Args:
             chunks: Retrieved chunk'lar (metadata ile) veya LangChain Document listesi
             include_metadata: Metadata'yı context'e dahil et
+            stable_order: Chunk'ları benzerlik yerine konumlarına göre sırala (bkz. stable_document_order)
             
         Returns:
             str: Formatlanmış context metni
         """
-        context_parts = []
+        if not chunks:
+            return ""
         
-        for i, chunk in enumerate(chunks, start=1):
-            # LangChain Document objesi mi kontrol et
-            if isinstance(chunk, Document):
-                text = chunk.page_content
-                metadata = chunk.metadata
-            else:
-                text = chunk.get('text', '')
-                metadata = chunk.get('metadata', {})
-            
-            if include_metadata:
-                source = metadata.get('source_file', 'Bilinmeyen')
-                page = metadata.get('page', '?')
-                context_parts.append(f"[Kaynak {i} - {source}, Sayfa {page}]\n{text}")
-            else:
-                context_parts.append(text)
+        # Girdi tek tiptir (retriever Document, eski API dict döndürür); tip bir kez kontrol edilir
+        from_documents = isinstance(chunks[0], Document)
+        
+        if not include_metadata and not stable_order:
+            # Metadata gerekmiyorsa (metin, metadata) ikilileri kurulmaz
+            if from_documents:
+                return _CONTEXT_SEPARATOR.join(chunk.page_content for chunk in chunks)
+            return _CONTEXT_SEPARATOR.join(chunk.get('text', '') for chunk in chunks)
         
-        return "\n\n---\n\n".join(context_parts)
+        # LangChain Document veya dict -> (metin, metadata)
+        if from_documents:
+            parts = ((chunk.page_content, chunk.metadata) for chunk in chunks)
+        else:
+            parts = ((chunk.get('text', ''), chunk.get('metadata', {})) for chunk in chunks)
+        if stable_order:
+            parts = sorted(parts, key=lambda part: _stable_key(*part))
+        
+        if not include_metadata:
+            return _CONTEXT_SEPARATOR.join(text for text, _ in parts)
+        
+        return _CONTEXT_SEPARATOR.join(
+            f"[Kaynak {i} - {metadata.get('source_file', 'Bilinmeyen')}, Sayfa {metadata.get('page', '?')}]\n{text}"
+            for i, (text, metadata) in enumerate(parts, start=1)
+        )
     
     @staticmethod
     def format_sources(chunks: List[Dict], documents: List[Document] = None) -> List[Dict]:
@@ -109,36 +198,32 @@ Cevap:"""
         Returns:
             List[Dict]: Formatlanmış kaynak listesi
         """
-        sources = []
-        
         # Eğer documents verilmişse onu kullan
         if documents:
-            for doc in documents:
-                metadata = doc.metadata
-                sources.append({
-                    'source_file': metadata.get('source_file', 'Bilinmeyen'),
-                    'page': metadata.get('page', '?'),
-                    'text_snippet': doc.page_content[:200] + '...' if len(doc.page_content) > 200 else doc.page_content,
+            return [
+                {
+                    'source_file': doc.metadata.get('source_file', 'Bilinmeyen'),
+                    'page': doc.metadata.get('page', '?'),
+                    'text_snippet': _snippet(doc.page_content),
                     'similarity': None,
-                    'chunk_id': metadata.get('chunk_id')
-                })
-            return sources
+                    'chunk_id': doc.metadata.get('chunk_id')
+                }
+                for doc in documents
+            ]
         
-        # Eski format için
+        # Eski format için (VectorStore.search sonuçları benzerliği hazır taşır;
+        # taşımayan dict'lerde cosine distance'tan 1 - distance ile hesaplanır)
+        sources = []
         for chunk in chunks:
             metadata = chunk.get('metadata', {})
-            distance = chunk.get('distance')
-            
-            # Cosine distance'ı similarity'ye çevir (1 - distance)
-            similarity = 1 - distance if distance is not None else None
-            
+            similarity = chunk.get('similarity')
+            if similarity is None and chunk.get('distance') is not None:
+                similarity = 1.0 - chunk['distance']
             sources.append({
                 'source_file': metadata.get('source_file', 'Bilinmeyen'),
                 'page': metadata.get('page', '?'),
-                'text_snippet': chunk.get('text', '')[:200] + '...' if len(chunk.get('text', '')) > 200 else chunk.get('text', ''),
-                'similarity': round(similarity, 3) if similarity is not None else None,
+                'text_snippet': _snippet(chunk.get('text', '')),
+                'similarity': None if similarity is None else round(similarity, 3),
                 'chunk_id': metadata.get('chunk_id')
             })
-        
         return sources
-
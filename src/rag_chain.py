@@ -4,19 +4,70 @@ RAG pipeline'ını yönetir.
 LangChain Chains kullanır.
 """
 
-from typing import List, Dict, Optional, Iterator
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, List, Dict, Optional, Iterator, Tuple
 from langchain.chains import RetrievalQA, ConversationalRetrievalChain
+from langchain.chains.combine_documents.stuff import StuffDocumentsChain
 from langchain.chains.retrieval_qa.base import BaseRetrievalQA
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain.schema import Document
-from .vector_store import VectorStore
+from .vector_store import VectorStore, query_embedding
 from .llm_handler import OllamaLLMHandler
 from .prompt_templates import PromptTemplates
 from .memory import MemoryManager
+from .semantic_cache import SemanticQueryCache
+from .answer_cache import AnswerCache, make_answer_key
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Doküman başına ayrı LLM çağrısı yapan (async yolda eşzamanlı çalışabilen) chain tipleri
+CONCURRENT_CHAIN_TYPES = ("map_reduce", "map_rerank")
+
+# Cevabı üreten (combine documents) chain'e verilen tag; streaming'de sadece bu LLM çağrıları akıtılır
+ANSWER_TAG = "rag_answer"
+
+# Şablonlar değişmez; tüm RAGChain'ler (her collection değişiminde yeniden oluşturulur) aynı objeyi kullanır
+_DEFAULT_PROMPTS = PromptTemplates()
+
+
+class _AnswerTokenHandler(BaseCallbackHandler):
+    """Cevap LLM çağrısının token'larını üretildikçe kuyruğa yazan callback handler"""
+    
+    def __init__(self, emit: Callable[[str], None]):
+        self.emit = emit
+        self._answer_runs = set()
+    
+    def _track(self, run_id, parent_run_id, tags):
+        # Tag'lenen chain ve altındaki tüm run'lar; soru yeniden yazma (condense question) gibi ara çağrılar atlanır
+        if (tags and ANSWER_TAG in tags) or parent_run_id in self._answer_runs:
+            self._answer_runs.add(run_id)
+    
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._track(run_id, parent_run_id, tags)
+    
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._track(run_id, parent_run_id, tags)
+    
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._track(run_id, parent_run_id, tags)
+    
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs):
+        if run_id in self._answer_runs:
+            self.emit(token)
+
+
+class _StableStuffDocumentsChain(StuffDocumentsChain):
+    """Dokümanları prompt'a sorgudan bağımsız, sabit bir sırada yerleştiren StuffDocumentsChain"""
+    
+    def _get_inputs(self, docs: List[Document], **kwargs) -> Dict:
+        return super()._get_inputs(PromptTemplates.stable_document_order(docs), **kwargs)
+
 
 class RAGChain:
     """RAG pipeline yöneticisi - LangChain Chains kullanır"""
@@ -28,7 +79,13 @@ class RAGChain:
         memory_manager: Optional[MemoryManager] = None,
         chain_type: str = "stuff",
         top_k: int = 5,
-        return_source_documents: bool = True
+        return_source_documents: bool = True,
+        semantic_cache_threshold: Optional[float] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        stable_context_order: bool = True,
+        retrieval_gate: bool = False,
+        similarity_threshold: Optional[float] = None,
+        verbose: bool = False
     ):
         """
         Args:
@@ -38,6 +95,19 @@ class RAGChain:
             chain_type: Chain tipi ("stuff", "map_reduce", "refine", "map_rerank")
             top_k: Top-K benzer chunk sayısı
             return_source_documents: Kaynak dokümanları döndür
+            semantic_cache_threshold: Önceki bir soruya bu cosine benzerliği ve üstünde
+                olan sorularda önbellekteki cevap döndürülür (None ise kapalı). Cevap
+                konuşma geçmişine bağlı olduğundan memory ile kullanılmaz.
+            answer_cache: Aynı sorular için cevap önbelleği (opsiyonel, memory ile kullanılmaz).
+                Chain yeniden oluşturulduğunda da korunması için dışarıdan verilir.
+            stable_context_order: Stuff chain'inde chunk'ları prompt'a doküman içindeki
+                konumlarına göre yerleştir (LLM sunucusunun prefix cache'i için)
+            retrieval_gate: Her sorudan önce LLM'e birkaç token'lık "doküman araması gerekli mi"
+                yoklaması yap; gerekmiyorsa (selamlaşma vb.) embedding, arama ve uzun context
+                atlanıp soru doğrudan LLM'e sorulur. Memory ile kullanılmaz.
+            similarity_threshold: Bu cosine benzerliğinin altındaki chunk'lar context'e alınmaz
+                (None ise filtre yok)
+            verbose: LangChain chain'lerinin prompt'ları ve ara adımları konsola yazdırması (debug için)
         """
         self.vector_store = vector_store
         self.llm_handler = llm_handler
@@ -45,7 +115,16 @@ class RAGChain:
         self.chain_type = chain_type
         self.top_k = top_k
         self.return_source_documents = return_source_documents
-        self.prompt_templates = PromptTemplates()
+        self.stable_context_order = stable_context_order
+        self.retrieval_gate = retrieval_gate and not memory_manager
+        self.similarity_threshold = similarity_threshold
+        self.verbose = verbose
+        self.prompt_templates = _DEFAULT_PROMPTS
+        self.last_sources: List[Dict] = []
+        self.semantic_cache_threshold = None if memory_manager else semantic_cache_threshold
+        self.semantic_cache: Optional[SemanticQueryCache] = None  # Boyut ilk sorguda belli olur
+        self.answer_cache = None if memory_manager else answer_cache
+        self._cache_version = vector_store.version
         
         # LangChain chain'i oluştur
         self.chain = self._create_chain()
@@ -53,9 +132,10 @@ class RAGChain:
     def _create_chain(self) -> BaseRetrievalQA:
         """LangChain chain'ini oluşturur"""
         llm = self.llm_handler.get_langchain_llm()
-        retriever = self.vector_store.as_retriever(
-            search_kwargs={"k": self.top_k}
-        )
+        search_kwargs = {"k": self.top_k}
+        if self.similarity_threshold is not None:
+            search_kwargs["score_threshold"] = self.similarity_threshold
+        retriever = self.vector_store.as_retriever(search_kwargs=search_kwargs)
         
         if self.memory_manager:
             # ConversationalRetrievalChain kullan (memory ile)
@@ -65,24 +145,194 @@ class RAGChain:
                 retriever=retriever,
                 memory=memory,
                 return_source_documents=self.return_source_documents,
-                verbose=True
+                verbose=self.verbose
             )
             logger.info("ConversationalRetrievalChain oluşturuldu")
         else:
             # RetrievalQA kullan (basit RAG)
-            prompt_template = self.prompt_templates.get_rag_template()
+            # Özel prompt sadece stuff chain'inde geçerli; diğer tipler
+            # (question_prompt/combine_prompt vb.) LangChain varsayılanlarını kullanır
+            chain_type_kwargs = {}
+            if self.chain_type == "stuff":
+                chain_type_kwargs["prompt"] = self.prompt_templates.get_rag_template()
             chain = RetrievalQA.from_chain_type(
                 llm=llm,
                 chain_type=self.chain_type,
                 retriever=retriever,
                 return_source_documents=self.return_source_documents,
-                chain_type_kwargs={"prompt": prompt_template},
-                verbose=True
+                chain_type_kwargs=chain_type_kwargs,
+                verbose=self.verbose
             )
             logger.info(f"RetrievalQA chain oluşturuldu (type: {self.chain_type})")
         
+        combine_attr = "combine_docs_chain" if hasattr(chain, "combine_docs_chain") else "combine_documents_chain"
+        combine_chain = getattr(chain, combine_attr)
+        if isinstance(combine_chain, StuffDocumentsChain):
+            if self.stable_context_order:
+                combine_chain = _StableStuffDocumentsChain(
+                    llm_chain=combine_chain.llm_chain,
+                    document_prompt=combine_chain.document_prompt,
+                    document_variable_name=combine_chain.document_variable_name,
+                    document_separator=combine_chain.document_separator,
+                    verbose=combine_chain.verbose
+                )
+                setattr(chain, combine_attr, combine_chain)
+            # Tek LLM çağrısıyla cevap üreten chain'i streaming için işaretle
+            combine_chain.tags = (combine_chain.tags or []) + [ANSWER_TAG]
+        
         return chain
     
+    @property
+    def uses_concurrent_llm_calls(self) -> bool:
+        """Chain birden fazla bağımsız LLM çağrısı yapıyorsa True (aquery ile paralelleşir)"""
+        return not self.memory_manager and self.chain_type in CONCURRENT_CHAIN_TYPES
+    
+    def _build_response(self, result: Dict) -> Dict:
+        """Chain çıktısını {'answer', 'sources'} formatına dönüştürür"""
+        if isinstance(self.chain, ConversationalRetrievalChain):
+            answer = result.get("answer", "")
+        else:
+            answer = result.get("result", "")
+        source_documents = result.get("source_documents", [])
+        
+        # Kaynakları formatla
+        sources = self.prompt_templates.format_sources(
+            chunks=[],
+            documents=source_documents
+        )
+        
+        return {
+            'answer': answer.strip() if answer else "Cevap oluşturulamadı.",
+            'sources': sources
+        }
+    
+    def _answer_key(self, question: str, filter_metadata: Optional[Dict]) -> str:
+        """Cevap önbelleği anahtarı (cevabı etkileyen tüm ayarlar dahil)"""
+        return make_answer_key(
+            question,
+            filter_metadata,
+            self.vector_store.collection_name,
+            self.vector_store.version,
+            self.top_k,
+            self.chain_type,
+            self.similarity_threshold
+        )
+    
+    def _sync_cache_version(self):
+        """Vector store içeriği değiştiyse önbellekleri temizler"""
+        if self._cache_version != self.vector_store.version:
+            if self.semantic_cache:
+                self.semantic_cache.clear()
+            if self.answer_cache:
+                self.answer_cache.clear()
+            self._cache_version = self.vector_store.version
+    
+    def _cached_response(
+        self,
+        question: str,
+        filter_metadata: Optional[Dict] = None
+    ) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """
+        Soruyu önbelleklerde arar: önce normalize metinle cevap önbelleği, sonra
+        (filtre yoksa) embedding benzerliğiyle semantik önbellek.
+        Vector store içeriği değiştiyse önbellekler önce temizlenir.
+        
+        Args:
+            question: Kullanıcı sorusu
+            filter_metadata: Metadata filtresi (opsiyonel)
+            
+        Returns:
+            Tuple[Optional[Dict], Optional[List[float]]]: (Önbellekteki cevap veya None,
+                soru embedding'i; semantik önbelleğe yazarken kullanılır)
+        """
+        self._sync_cache_version()
+        
+        if self.answer_cache:
+            cached = self.answer_cache.get(self._answer_key(question, filter_metadata))
+            if cached:
+                return cached, None
+        
+        if self.semantic_cache_threshold is None or filter_metadata:
+            return None, None
+        
+        try:
+            embedding = self.vector_store.embeddings.embed_query(question)
+            if self.semantic_cache is None:
+                self.semantic_cache = SemanticQueryCache(
+                    len(embedding), threshold=self.semantic_cache_threshold
+                )
+            return self.semantic_cache.get(embedding), embedding
+        except Exception as e:
+            logger.warning(f"Semantik önbellek kullanılamadı: {e}")
+            return None, None
+    
+    @contextmanager
+    def _reuse_embedding(self, question: str, embedding: Optional[List[float]]):
+        """Semantik önbellek için hesaplanan soru embedding'ini retriever'a aktarır (soru tekrar embed edilmez)"""
+        token = query_embedding.set((question, embedding) if embedding is not None else None)
+        try:
+            yield
+        finally:
+            query_embedding.reset(token)
+    
+    def _store_response(
+        self,
+        question: str,
+        filter_metadata: Optional[Dict],
+        embedding: Optional[List[float]],
+        response: Dict
+    ):
+        """Cevabı önbelleklere yazar (sorgu sırasında vector store değiştiyse yazmaz)"""
+        if self._cache_version != self.vector_store.version:
+            return
+        if self.answer_cache:
+            self.answer_cache.put(self._answer_key(question, filter_metadata), response)
+        if embedding is not None:
+            self.semantic_cache.put(embedding, response)
+    
+    def _parse_gate_verdict(self, verdict: str) -> bool:
+        """Yoklama cevabını yorumlar; belirsiz cevaplarda retrieval yapılır"""
+        needed = not verdict.strip().lower().startswith(("hayır", "hayir", "no"))
+        if not needed:
+            logger.info("Retrieval gerekli görülmedi, soru doğrudan LLM'e soruluyor")
+        return needed
+    
+    def _needs_retrieval(self, question: str) -> bool:
+        """
+        Sorunun doküman araması gerektirip gerektirmediğini LLM'e sorar (retrieval_gate açıksa).
+        
+        Args:
+            question: Kullanıcı sorusu
+            
+        Returns:
+            bool: Retrieval gerekiyorsa (veya yoklama başarısızsa) True
+        """
+        if not self.retrieval_gate:
+            return True
+        
+        try:
+            verdict = self.llm_handler.generate(
+                self.prompt_templates.retrieval_gate_prompt(question), max_tokens=3
+            )
+        except Exception as e:
+            logger.warning(f"Retrieval yoklaması başarısız: {e}")
+            return True
+        return self._parse_gate_verdict(verdict)
+    
+    async def _aneeds_retrieval(self, question: str) -> bool:
+        """_needs_retrieval metodunun async versiyonu"""
+        if not self.retrieval_gate:
+            return True
+        
+        try:
+            verdict = await self.llm_handler.agenerate(
+                self.prompt_templates.retrieval_gate_prompt(question), max_tokens=3
+            )
+        except Exception as e:
+            logger.warning(f"Retrieval yoklaması başarısız: {e}")
+            return True
+        return self._parse_gate_verdict(verdict)
+    
     def query(self, question: str, filter_metadata: Optional[Dict] = None) -> Dict:
         """
         Kullanıcı sorusuna RAG ile cevap verir.
@@ -97,28 +347,68 @@ class RAGChain:
         logger.info(f"Soru işleniyor: {question[:50]}...")
         
         try:
+            cached, embedding = self._cached_response(question, filter_metadata)
+            if cached:
+                return cached
+            
+            if not self._needs_retrieval(question):
+                response = {'answer': self.llm_handler.generate(question).strip(), 'sources': []}
+                self._store_response(question, filter_metadata, embedding, response)
+                return response
+            
             # LangChain chain'i kullan
             if isinstance(self.chain, ConversationalRetrievalChain):
                 # ConversationalRetrievalChain için
                 result = self.chain({"question": question})
-                answer = result.get("answer", "")
-                source_documents = result.get("source_documents", [])
             else:
                 # RetrievalQA için
-                result = self.chain({"query": question})
-                answer = result.get("result", "")
-                source_documents = result.get("source_documents", [])
-            
-            # Kaynakları formatla
-            sources = self.prompt_templates.format_sources(
-                chunks=[],
-                documents=source_documents
-            )
+                with self._reuse_embedding(question, embedding):
+                    result = self.chain({"query": question})
+            
+            response = self._build_response(result)
+            self._store_response(question, filter_metadata, embedding, response)
+            return response
             
+        except Exception as e:
+            logger.error(f"RAG chain hatası: {e}")
             return {
-                'answer': answer.strip() if answer else "Cevap oluşturulamadı.",
-                'sources': sources
+                'answer': "Üzgünüm, cevap oluşturulurken bir hata oluştu.",
+                'sources': []
             }
+    
+    async def aquery(self, question: str, filter_metadata: Optional[Dict] = None) -> Dict:
+        """
+        query() metodunun async versiyonu.
+        map_reduce/map_rerank chain'lerinde doküman başına LLM çağrıları eşzamanlı gönderilir.
+        
+        Args:
+            question: Kullanıcı sorusu
+            filter_metadata: Metadata filtresi (opsiyonel)
+            
+        Returns:
+            Dict: {'answer': str, 'sources': List[Dict]}
+        """
+        logger.info(f"Soru işleniyor (async): {question[:50]}...")
+        
+        try:
+            cached, embedding = self._cached_response(question, filter_metadata)
+            if cached:
+                return cached
+            
+            if not await self._aneeds_retrieval(question):
+                response = {'answer': (await self.llm_handler.agenerate(question)).strip(), 'sources': []}
+                self._store_response(question, filter_metadata, embedding, response)
+                return response
+            
+            if isinstance(self.chain, ConversationalRetrievalChain):
+                result = await self.chain.ainvoke({"question": question})
+            else:
+                with self._reuse_embedding(question, embedding):
+                    result = await self.chain.ainvoke({"query": question})
+            
+            response = self._build_response(result)
+            self._store_response(question, filter_metadata, embedding, response)
+            return response
             
         except Exception as e:
             logger.error(f"RAG chain hatası: {e}")
@@ -127,9 +417,226 @@ class RAGChain:
                 'sources': []
             }
     
+    def query_batch(self, questions: List[str], max_concurrency: int = 4) -> List[Dict]:
+        """
+        Birden fazla soruyu birlikte cevaplar (değerlendirme veya çok kullanıcılı iş yükleri).
+        Sorular birlikte embed edilir, tek vector store çağrısıyla aranır ve
+        cevap LLM çağrıları eşzamanlı gönderilir. Önbellekteki sorular atlanır;
+        retrieval_gate açıksa yoklama query() ile aynı şekilde her soru için yapılır.
+        
+        Args:
+            questions: Kullanıcı soruları
+            max_concurrency: Aynı anda gönderilecek en fazla LLM isteği
+            
+        Returns:
+            List[Dict]: Soru sırasıyla {'answer': str, 'sources': List[Dict]} listesi
+        """
+        if isinstance(self.chain, ConversationalRetrievalChain):
+            # Her soru konuşma geçmişini değiştirir; sırayla çalıştırılır
+            return [self.query(question) for question in questions]
+        
+        logger.info(f"{len(questions)} soru birlikte işleniyor...")
+        error_response = {
+            'answer': "Üzgünüm, cevap oluşturulurken bir hata oluştu.",
+            'sources': []
+        }
+        responses: List[Optional[Dict]] = [None] * len(questions)
+        self._sync_cache_version()
+        
+        pending = []
+        for i, question in enumerate(questions):
+            cached = self.answer_cache.get(self._answer_key(question, None)) if self.answer_cache else None
+            if cached:
+                responses[i] = cached
+            else:
+                pending.append(i)
+        if not pending:
+            return responses
+        
+        try:
+            embeddings = self._embed_questions([questions[i] for i in pending])
+            if self.semantic_cache_threshold is not None and self.semantic_cache is None:
+                self.semantic_cache = SemanticQueryCache(
+                    len(embeddings[0]), threshold=self.semantic_cache_threshold
+                )
+            
+            to_answer = []
+            for i, embedding in zip(pending, embeddings):
+                cached = self.semantic_cache.get(embedding) if self.semantic_cache else None
+                if cached:
+                    responses[i] = cached
+                else:
+                    to_answer.append((i, embedding))
+            
+            if self.retrieval_gate and to_answer:
+                with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                    needed = list(executor.map(self._needs_retrieval, [questions[i] for i, _ in to_answer]))
+                direct = [item for item, need in zip(to_answer, needed) if not need]
+                to_answer = [item for item, need in zip(to_answer, needed) if need]
+                self._answer_directly(questions, direct, responses, max_concurrency)
+            
+            results = self.vector_store.batch_search(
+                [embedding for _, embedding in to_answer], top_k=self.top_k
+            )
+            threshold = self.similarity_threshold
+            documents = [
+                [
+                    Document(page_content=r['text'], metadata=r['metadata'])
+                    for r in rows
+                    if threshold is None or r['similarity'] >= threshold
+                ]
+                for rows in results
+            ]
+            
+            # RetrievalQA._call ile aynı: retriever yerine hazır dokümanlarla combine chain
+            combine_chain = self.chain.combine_documents_chain
+            outputs = combine_chain.batch(
+                [
+                    {"input_documents": docs, "question": questions[i]}
+                    for (i, _), docs in zip(to_answer, documents)
+                ],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True
+            )
+            
+            for (i, embedding), docs, output in zip(to_answer, documents, outputs):
+                if isinstance(output, Exception):
+                    logger.error(f"RAG chain hatası: {output}")
+                    continue
+                response = self._build_response({
+                    "result": output[combine_chain.output_key],
+                    "source_documents": docs if self.return_source_documents else []
+                })
+                self._store_response(
+                    questions[i],
+                    None,
+                    embedding if self.semantic_cache else None,
+                    response
+                )
+                responses[i] = response
+        except Exception as e:
+            logger.error(f"RAG batch hatası: {e}")
+        
+        return [response or dict(error_response) for response in responses]
+    
+    def _embed_questions(self, questions: List[str]) -> List[List[float]]:
+        """
+        Soruları embed_query ile aynı vektörlere çevirir. Embeddings objesi batch sorgu
+        embedding'i sunuyorsa (embed_queries) tek çağrı yapılır; embed_documents kullanılmaz,
+        çünkü sorgu talimatı/öneki olan modellerde farklı vektör üretir.
+        """
+        embeddings = self.vector_store.embeddings
+        embed_queries = getattr(embeddings, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(questions)
+        return [embeddings.embed_query(question) for question in questions]
+    
+    def _answer_directly(
+        self,
+        questions: List[str],
+        items: List[Tuple[int, List[float]]],
+        responses: List[Optional[Dict]],
+        max_concurrency: int
+    ):
+        """Retrieval gerekmeyen soruları doğrudan LLM'e sorar (query() ile aynı cevap biçimi)"""
+        if not items:
+            return
+        try:
+            answers = self.llm_handler.generate_batch(
+                [questions[i] for i, _ in items], max_concurrency=max_concurrency
+            )
+        except Exception as e:
+            logger.error(f"RAG chain hatası: {e}")
+            return
+        for (i, embedding), answer in zip(items, answers):
+            response = {'answer': answer.strip(), 'sources': []}
+            self._store_response(
+                questions[i],
+                None,
+                embedding if self.semantic_cache else None,
+                response
+            )
+            responses[i] = response
+    
     def query_streaming(self, question: str, filter_metadata: Optional[Dict] = None) -> Iterator[str]:
         """
         Streaming modda RAG sorgusu.
+        Chain arka planda çalışır, cevap token'ları LLM ürettikçe döndürülür.
+        Token streaming sadece stuff chain'inde yapılır; diğer tiplerde cevap tamamlanınca tek parça döner.
+        Kaynaklar sorgu bitince self.last_sources'a yazılır.
+        
+        Args:
+            question: Kullanıcı sorusu
+            filter_metadata: Metadata filtresi (opsiyonel)
+            
+        Yields:
+            str: Streaming cevap parçaları
+        """
+        cached, embedding = self._cached_response(question, filter_metadata)
+        if cached:
+            self.last_sources = cached['sources']
+            yield cached['answer']
+            return
+        
+        if not self._needs_retrieval(question):
+            self.last_sources = []
+            try:
+                yield from self.llm_handler.generate(question, stream=True)
+            except Exception as e:
+                logger.error(f"LLM streaming hatası: {e}")
+                yield "Üzgünüm, cevap oluşturulurken bir hata oluştu."
+            return
+        
+        token_queue = queue.Queue()
+        done = object()
+        outcome = {}
+        
+        if isinstance(self.chain, ConversationalRetrievalChain):
+            inputs = {"question": question}
+        else:
+            inputs = {"query": question}
+        
+        def run_chain():
+            try:
+                with self._reuse_embedding(question, embedding):
+                    outcome['result'] = self.chain.invoke(
+                        inputs,
+                        config={"callbacks": [_AnswerTokenHandler(token_queue.put)]}
+                    )
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                token_queue.put(done)
+        
+        self.last_sources = []
+        threading.Thread(target=run_chain, daemon=True).start()
+        
+        streamed = False
+        while True:
+            token = token_queue.get()
+            if token is done:
+                break
+            streamed = True
+            yield token
+        
+        if 'error' in outcome:
+            logger.error(f"RAG streaming hatası: {outcome['error']}")
+            if not streamed:
+                yield "Üzgünüm, cevap oluşturulurken bir hata oluştu."
+            return
+        
+        response = self._build_response(outcome['result'])
+        self._store_response(question, filter_metadata, embedding, response)
+        self.last_sources = response['sources']
+        if not streamed:
+            yield response['answer']
+    
+    async def aquery_streaming(self, question: str, filter_metadata: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        query_streaming metodunun async versiyonu.
+        Soru embedding'i ve önbellek kontrolü thread'de çalışırken retrieval yoklaması
+        (retrieval_gate açıksa) aynı anda Ollama'ya gönderilir; önbellek isabetinde yoklama iptal edilir.
+        Kaynaklar sorgu bitince self.last_sources'a yazılır.
         
         Args:
             question: Kullanıcı sorusu
@@ -138,21 +645,66 @@ class RAGChain:
         Yields:
             str: Streaming cevap parçaları
         """
+        gate = asyncio.ensure_future(self._aneeds_retrieval(question))
         try:
-            # LangChain chain streaming
-            if isinstance(self.chain, ConversationalRetrievalChain):
-                for chunk in self.chain.stream({"question": question}):
-                    if "answer" in chunk:
-                        yield chunk["answer"]
-            else:
-                # RetrievalQA streaming desteği sınırlı
-                result = self.chain({"query": question})
-                answer = result.get("result", "")
-                # Basit streaming simülasyonu
-                words = answer.split()
-                for word in words:
-                    yield word + " "
-        except Exception as e:
-            logger.error(f"RAG streaming hatası: {e}")
-            yield "Üzgünüm, cevap oluşturulurken bir hata oluştu."
-
+            cached, embedding = await asyncio.to_thread(self._cached_response, question, filter_metadata)
+        except BaseException:
+            gate.cancel()
+            raise
+        if cached:
+            gate.cancel()
+            self.last_sources = cached['sources']
+            yield cached['answer']
+            return
+        
+        if not await gate:
+            self.last_sources = []
+            try:
+                async for chunk in self.llm_handler.astream(question):
+                    yield chunk
+            except Exception as e:
+                logger.error(f"LLM streaming hatası: {e}")
+                yield "Üzgünüm, cevap oluşturulurken bir hata oluştu."
+            return
+        
+        loop = asyncio.get_running_loop()
+        token_queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        
+        if isinstance(self.chain, ConversationalRetrievalChain):
+            inputs = {"question": question}
+        else:
+            inputs = {"query": question}
+        
+        # Senkron callback'ler executor thread'inde çalışabilir; token'lar event loop'a aktarılır
+        handler = _AnswerTokenHandler(lambda token: loop.call_soon_threadsafe(token_queue.put_nowait, token))
+        # Task oluşturulduğu andaki context'i kopyalar
+        with self._reuse_embedding(question, embedding):
+            task = asyncio.ensure_future(self.chain.ainvoke(inputs, config={"callbacks": [handler]}))
+        task.add_done_callback(lambda _: token_queue.put_nowait(done))
+        
+        self.last_sources = []
+        streamed = False
+        try:
+            while True:
+                token = await token_queue.get()
+                if token is done:
+                    break
+                streamed = True
+                yield token
+        finally:
+            # Tüketici erken çıkarsa chain iptal edilir
+            if not task.done():
+                task.cancel()
+        
+        if task.exception() is not None:
+            logger.error(f"RAG streaming hatası: {task.exception()}")
+            if not streamed:
+                yield "Üzgünüm, cevap oluşturulurken bir hata oluştu."
+            return
+        
+        response = self._build_response(task.result())
+        self._store_response(question, filter_metadata, embedding, response)
+        self.last_sources = response['sources']
+        if not streamed:
+            yield response['answer']
@@ -0,0 +1,132 @@
+"""
+Semantik Sorgu Önbelleği Modülü
+Anlamca çok yakın sorular için önceki RAG cevabını döndürür.
+Aday sorular random-projection LSH ile bulunur, cosine benzerliğiyle doğrulanır.
+"""
+
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SemanticQueryCache:
+    """
+    Soru embedding'i -> cevap önbelleği.
+    
+    Her tablo embedding'i num_bits rastgele hiperdüzlemle işaretleyip bir bucket'a
+    yerleştirir; benzer vektörler en az bir tabloda aynı bucket'a düşer. Aday
+    vektörler tek bir matris-vektör çarpımıyla doğrulanır (eşik altı eşleşme dönmez).
+    Kapasite dolunca en eski kayıtların yerine yazılır.
+    """
+    
+    def __init__(
+        self,
+        dimension: int,
+        threshold: float = 0.95,
+        num_tables: int = 8,
+        num_bits: int = 12,
+        max_entries: int = 512,
+        seed: int = 0
+    ):
+        """
+        Args:
+            dimension: Embedding boyutu
+            threshold: Önbellek isabeti için minimum cosine benzerliği
+            num_tables: LSH tablo sayısı (fazlası isabet oranını artırır)
+            num_bits: Tablo başına hash bit sayısı (fazlası bucket'ları küçültür)
+            max_entries: Saklanacak en fazla soru sayısı
+            seed: Hiperdüzlemler için rastgele tohum
+        """
+        self.threshold = threshold
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.max_entries = max_entries
+        
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((num_tables * num_bits, dimension)).astype(np.float32)
+        
+        # Kayıtlar slot'larda tutulur; vektörler tek bitişik matriste
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._responses: List[Optional[Dict]] = [None] * max_entries
+        self._signatures: List[Optional[List[bytes]]] = [None] * max_entries
+        self._buckets: List[Dict[bytes, set]] = [{} for _ in range(num_tables)]
+        self._next_slot = 0
+        self._lock = threading.Lock()
+    
+    def _signature(self, embedding: np.ndarray) -> List[bytes]:
+        """Her tablo için bucket anahtarı (işaret bitleri byte'lara paketlenir)"""
+        bits = (self._planes @ embedding > 0).reshape(self.num_tables, self.num_bits)
+        return [row.tobytes() for row in np.packbits(bits, axis=1)]
+    
+    def get(self, embedding: List[float]) -> Optional[Dict]:
+        """
+        Embedding'e eşik üstü benzerlikteki en yakın önceki sorunun cevabını döndürür.
+        
+        Args:
+            embedding: Normalize edilmiş soru embedding'i
+            
+        Returns:
+            Optional[Dict]: {'answer', 'sources'} veya isabet yoksa None
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._buckets, self._signature(query)):
+                candidates.update(table.get(key, ()))
+            if not candidates:
+                return None
+            
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            scores = self._vectors[slots] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            logger.info(f"Semantik önbellek isabeti (benzerlik: {scores[best]:.3f})")
+            return dict(self._responses[slots[best]])
+    
+    def put(self, embedding: List[float], response: Dict) -> None:
+        """
+        Soru embedding'ini ve cevabını önbelleğe ekler.
+        
+        Args:
+            embedding: Normalize edilmiş soru embedding'i
+            response: {'answer', 'sources'} cevabı
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        signature = self._signature(vector)
+        with self._lock:
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.max_entries
+            self._evict(slot)
+            
+            self._vectors[slot] = vector
+            self._responses[slot] = dict(response)
+            self._signatures[slot] = signature
+            for table, bucket_key in zip(self._buckets, signature):
+                table.setdefault(bucket_key, set()).add(slot)
+    
+    def _evict(self, slot: int):
+        """Slot'taki eski kaydı indekslerden çıkarır (kilit altında çağrılır)"""
+        if self._signatures[slot] is None:
+            return
+        
+        for table, bucket_key in zip(self._buckets, self._signatures[slot]):
+            bucket = table.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del table[bucket_key]
+        self._responses[slot] = self._signatures[slot] = None
+    
+    def clear(self) -> None:
+        """Tüm kayıtları siler"""
+        with self._lock:
+            self._responses = [None] * self.max_entries
+            self._signatures = [None] * self.max_entries
+            self._buckets = [{} for _ in range(self.num_tables)]
+            self._next_slot = 0
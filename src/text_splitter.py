@@ -3,13 +3,40 @@ Text Chunking Modülü
 Metinleri chunk'lara böler ve metadata ekler.
 """
 
-from typing import List, Dict
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Worker başına düşen minimum sayfa sayısı (küçük PDF'lerde process açmaya değmez)
+MIN_PAGES_PER_WORKER = 16
+
+
+def _split_texts(
+    texts: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: List[str]
+) -> List[List[str]]:
+    """
+    Metinleri ayrı ayrı chunk'lara böler (metin başına bir chunk listesi).
+    ProcessPoolExecutor ile pickle edilebilmesi için modül seviyesinde tanımlı;
+    splitter worker içinde bir kez oluşturulur.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=separators,
+        length_function=len,
+    )
+    return [splitter.split_text(text) for text in texts]
+
 
 class TextSplitter:
     """Metinleri chunk'lara bölen sınıf"""
@@ -18,19 +45,23 @@ class TextSplitter:
         self,
         chunk_size: int = 500,
         chunk_overlap: int = 150,
-        separators: List[str] = None
+        separators: List[str] = None,
+        max_workers: Optional[int] = None
     ):
         """
         Args:
             chunk_size: Chunk boyutu (karakter)
             chunk_overlap: Overlap boyutu (karakter)
             separators: Bölme ayırıcıları (öncelik sırasına göre)
+            max_workers: Paralel bölme için process sayısı (varsayılan: min(CPU sayısı, 4))
         """
         if separators is None:
             separators = ["\n\n", "\n", ". ", " ", ""]
         
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 4)
         
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
@@ -39,6 +70,55 @@ class TextSplitter:
             length_function=len,
         )
     
+    def _split_texts_parallel(self, texts: List[str]) -> List[List[str]]:
+        """
+        Metinleri process havuzunda böler; sonuçlar girdi sırasıyla döner.
+        Az sayıda metinde seri çalışır.
+        """
+        workers = min(self.max_workers, len(texts) // MIN_PAGES_PER_WORKER)
+        if workers <= 1:
+            return [self.splitter.split_text(text) for text in texts]
+        
+        # Metinleri worker sayısı kadar ardışık gruba böl
+        per_worker = -(-len(texts) // workers)
+        groups = [texts[start:start + per_worker] for start in range(0, len(texts), per_worker)]
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _split_texts,
+                groups,
+                [self.chunk_size] * len(groups),
+                [self.chunk_overlap] * len(groups),
+                [self.separators] * len(groups)
+            )
+            return [chunks for group in results for chunks in group]
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        LangChain Document'lerini (sayfaları) chunk'lara böler.
+        RecursiveCharacterTextSplitter.split_documents ile aynı çıktıyı üretir,
+        büyük PDF'lerde sayfalar process havuzunda paralel bölünür.
+        
+        Args:
+            documents: Bölünecek Document listesi
+            
+        Returns:
+            List[Document]: Chunk Document'leri (sayfa metadata'sı kopyalanır, split_pages'teki
+                gibi okuma sırasına göre 1'den başlayan chunk_id eklenir)
+        """
+        page_chunks = self._split_texts_parallel([doc.page_content for doc in documents])
+        
+        chunks = []
+        for doc, texts in zip(documents, page_chunks):
+            for chunk_text in texts:
+                metadata = copy.deepcopy(doc.metadata)
+                # Context sıralaması (dosya, sayfa, chunk_id) aynı sayfadaki chunk'ları okuma sırasında tutar
+                metadata['chunk_id'] = len(chunks) + 1
+                chunks.append(Document(page_content=chunk_text, metadata=metadata))
+        
+        logger.info(f"Toplam {len(chunks)} chunk oluşturuldu")
+        return chunks
+    
     def split_pages(self, pages_content: List[Dict], source_filename: str) -> List[Dict]:
         """
         Sayfa içeriklerini chunk'lara böler ve metadata ekler.
@@ -50,28 +130,29 @@ class TextSplitter:
         Returns:
             List[Dict]: Her chunk için {'text': str, 'metadata': dict} formatında liste
         """
+        # Sayfalar (büyük PDF'lerde paralel) bölünür; chunk_id'ler sonra sırayla verilir
+        pages_chunks = self._split_texts_parallel([page_data['text'] for page_data in pages_content])
+        
         chunks = []
         chunk_id = 0
         
-        for page_data in pages_content:
+        for page_data, page_chunks in zip(pages_content, pages_chunks):
             page_num = page_data['page']
-            page_text = page_data['text']
-            
-            # Sayfa metnini chunk'lara böl
-            page_chunks = self.splitter.split_text(page_text)
             
             for chunk_text in page_chunks:
-                if chunk_text.strip():  # Boş chunk'ları atla
-                    chunk_id += 1
-                    chunks.append({
-                        'text': chunk_text.strip(),
-                        'metadata': {
-                            'source_file': source_filename,
-                            'page': page_num,
-                            'chunk_id': chunk_id,
-                            'chunk_size': len(chunk_text)
-                        }
-                    })
+                text = chunk_text.strip()
+                if not text:  # Boş chunk'ları atla
+                    continue
+                chunk_id += 1
+                chunks.append({
+                    'text': text,
+                    'metadata': {
+                        'source_file': source_filename,
+                        'page': page_num,
+                        'chunk_id': chunk_id,
+                        'chunk_size': len(chunk_text)
+                    }
+                })
         
         logger.info(f"Toplam {len(chunks)} chunk oluşturuldu")
         return chunks
@@ -94,13 +175,14 @@ class TextSplitter:
         chunks = []
         
         for idx, chunk_text in enumerate(text_chunks):
-            if chunk_text.strip():
+            text = chunk_text.strip()
+            if text:
                 chunk_metadata = metadata.copy()
                 chunk_metadata['chunk_id'] = idx + 1
                 chunk_metadata['chunk_size'] = len(chunk_text)
                 
                 chunks.append({
-                    'text': chunk_text.strip(),
+                    'text': text,
                     'metadata': chunk_metadata
                 })
         
@@ -4,16 +4,188 @@ ChromaDB ile vektör saklama ve arama işlemleri.
 LangChain Chroma wrapper kullanır.
 """
 
+import asyncio
+import functools
 import os
-from typing import List, Dict, Optional
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, Optional
+import numpy as np
+import chromadb
 from langchain_chroma import Chroma
 from langchain.schema import Document
 from langchain.embeddings.base import Embeddings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.pydantic_v1 import Field, PrivateAttr
+from .embedding_archive import EmbeddingArchive
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Mutlak persist dizini -> PersistentClient. Aynı dizindeki tüm VectorStore'lar ve
+# collection değişimleri tek client'ı (SQLite bağlantısı ve yüklü HNSW index'leri) paylaşır.
+_CLIENT_CACHE: Dict[str, Any] = {}
+_CLIENT_LOCK = threading.Lock()
+
+# Yeni collection'lar için HNSW parametreleri (Chroma varsayılanı M=16, construction_ef=100,
+# search_ef=10; search_ef < top_k olduğunda recall belirgin düşer)
+DEFAULT_INDEX_PARAMS = {'M': 32, 'construction_ef': 200, 'search_ef': 64}
+
+
+def _get_client(persist_directory: str):
+    """persist_directory için paylaşılan ChromaDB client'ını döndürür (yoksa oluşturur)"""
+    path = os.path.abspath(persist_directory)
+    with _CLIENT_LOCK:
+        client = _CLIENT_CACHE.get(path)
+        if client is None:
+            client = chromadb.PersistentClient(path=path)
+            _CLIENT_CACHE[path] = client
+        return client
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    """Vektörleri birim uzunluğa getirir (float32 matris; ip uzayında iç çarpım = cosine)"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix
+
+
+class _NormalizedEmbeddings(Embeddings):
+    """
+    Chroma wrapper'ına verilen Embeddings; vektörleri birim uzunluğa getirir.
+    Wrapper'ın kendi embed ettiği sorgular da (similarity_search_with_score)
+    ip uzayında cosine benzerliğiyle aynı sıralamayı verir.
+    """
+    
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _normalize_rows(self.inner.embed_documents(texts)).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return _normalize_rows(self.inner.embed_query(text))[0].tolist()
+
+
+def document_id(document: Document) -> str:
+    """İçerik ve metadata'dan deterministik doküman ID'si (aynı chunk tekrar eklenmez)"""
+    payload = document.page_content + json.dumps(document.metadata, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# (soru, embedding): RAGChain soruyu semantik önbellek için zaten embed ettiyse retriever
+# aynı soruyu tekrar embed etmez. ContextVar olduğundan eşzamanlı sorgular birbirini görmez.
+query_embedding: ContextVar[Optional[tuple]] = ContextVar("query_embedding", default=None)
+
+
+class _StoreRetriever(BaseRetriever):
+    """
+    VectorStore.similarity_search_with_score üzerinden çalışan LangChain retriever.
+    search_kwargs["score_threshold"] verilirse cosine benzerliği eşiğin altındaki
+    sonuçlar tek bir vektörel karşılaştırmayla elenir. query_embedding'de aynı soru
+    için embedding varsa arama similarity_search_by_vector_with_score ile yapılır.
+    """
+    
+    vector_store: Any
+    search_kwargs: Dict = Field(default_factory=dict)
+    _search: Callable = PrivateAttr()
+    _search_by_vector: Callable = PrivateAttr()
+    _threshold: Optional[float] = PrivateAttr()
+    
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        # k ve filter retriever ömrü boyunca sabit; sorgu başına kwargs kurulmaz.
+        # Chroma wrapper'ına değil VectorStore'a bağlanır (collection değişimi ve arşiv geçerli kalır)
+        k, filter = self.search_kwargs.get("k", 4), self.search_kwargs.get("filter")
+        self._search = functools.partial(self.vector_store.similarity_search_with_score, k=k, filter=filter)
+        self._search_by_vector = functools.partial(
+            self.vector_store.similarity_search_by_vector_with_score, k=k, filter=filter
+        )
+        self._threshold = self.search_kwargs.get("score_threshold")
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        precomputed = query_embedding.get()
+        if precomputed is not None and precomputed[0] == query:
+            results = self._search_by_vector(precomputed[1])
+        else:
+            results = self._search(query)
+        threshold = self._threshold
+        if threshold is None or not results:
+            return [doc for doc, _ in results]
+        
+        scores = np.fromiter((score for _, score in results), dtype=np.float32, count=len(results))
+        similarities = self.vector_store.scores_to_similarity(scores)
+        keep = np.nonzero(similarities >= np.float32(threshold))[0]
+        return [results[i][0] for i in keep]
+
+
+class ChunkedInsert:
+    """
+    Dokümanları tek tek alıp chunksize'lık gruplar halinde vector store'a yazan context manager.
+    Generator'dan gelen büyük doküman akışları belleğe toplanmadan eklenir; her
+    yazmadan sonra tampon boşaltılır. Çıkışta kalan dokümanlar yazılır.
+    
+    Kullanım:
+        with ChunkedInsert(vector_store) as inserter:
+            for doc in documents:
+                inserter.insert(doc)
+    """
+    
+    def __init__(self, vector_store: Any, chunksize: int = 4096):
+        """
+        Args:
+            vector_store: add_documents metodu olan store (VectorStore veya FaissVectorStore)
+            chunksize: Tek seferde yazılacak doküman sayısı
+        """
+        self.vector_store = vector_store
+        self.chunksize = chunksize
+        self.inserted = 0  # Yazılmak üzere gönderilen doküman sayısı (kayıtlı olanlar dahil)
+        self._documents: List[Document] = []
+        self._ids: List[str] = []
+    
+    def __enter__(self) -> "ChunkedInsert":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Hata durumunda yarım tampon yazılmaz
+        if exc_type is None:
+            self.flush()
+        else:
+            self._documents.clear()
+            self._ids.clear()
+    
+    def insert(self, document: Document, doc_id: Optional[str] = None):
+        """
+        Dokümanı tampona ekler, tampon dolunca yazar.
+        
+        Args:
+            document: LangChain Document
+            doc_id: Özel ID (opsiyonel, verilmezse içerikten üretilir)
+        """
+        self._documents.append(document)
+        self._ids.append(doc_id or document_id(document))
+        if len(self._documents) >= self.chunksize:
+            self.flush()
+    
+    def flush(self):
+        """Tampondaki dokümanları yazar ve tamponu boşaltır"""
+        if not self._documents:
+            return
+        
+        self.vector_store.add_documents(self._documents, ids=self._ids)
+        self.inserted += len(self._documents)
+        self._documents = []
+        self._ids = []
+
 
 class VectorStore:
     """ChromaDB vektör veritabanı yöneticisi - LangChain Chroma wrapper"""
@@ -22,55 +194,133 @@ class VectorStore:
         self,
         persist_directory: str = "./data/chroma_db",
         collection_name: str = "pdf_collection",
-        embeddings: Optional[Embeddings] = None
+        embeddings: Optional[Embeddings] = None,
+        batch_size: int = 512,
+        archive_directory: Optional[str] = None,
+        archive_quantization: Optional[str] = None,
+        index_params: Optional[Dict] = None,
+        similarity_metric: str = "ip"
     ):
         """
         Args:
             persist_directory: ChromaDB kalıcı depolama dizini
             collection_name: Collection adı
             embeddings: LangChain Embeddings objesi (opsiyonel, sonra set edilebilir)
+            batch_size: add_documents'ta tek seferde yazılacak doküman sayısı
+            archive_directory: Embedding'lerin .npy olarak da saklanacağı dizin (opsiyonel).
+                Verilirse filtresiz aramalar mmap'li matris üzerinde yapılır.
+            archive_quantization: Arşivin saklama formatı (None: float32, "int8", "binary")
+            index_params: Yeni collection'ların HNSW parametreleri (M, construction_ef, search_ef;
+                None: DEFAULT_INDEX_PARAMS, {}: Chroma varsayılanları, bkz. index_params_for_corpus_size).
+                Mevcut collection'lar oluşturuldukları parametrelerle açılır; chromadb search_ef'i
+                de oluşturma anında sabitler, daha yüksek recall için collection yeniden oluşturulmalıdır.
+            similarity_metric: Yeni collection'ların mesafe ölçüsü ("ip", "cosine", "l2").
+                Vektörler yazılırken ve aranırken birim uzunluğa getirildiğinden "ip"
+                cosine ile aynı sonucu verir, HNSW mesafe hesabında normalize yapılmaz.
         """
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         self._embeddings = embeddings
+        self.batch_size = batch_size
+        self.index_params = dict(DEFAULT_INDEX_PARAMS if index_params is None else index_params)
+        self.similarity_metric = similarity_metric
+        # İçerik her değiştiğinde artar; sorgu önbellekleri bununla geçersiz kılınır
+        self.version = 0
+        # (version, doküman sayısı); içerik veya collection değişince yeniden sayılır
+        self._count_cache: Optional[tuple] = None
+        # (version, arşiv collection ile senkron mu); sayılar her sorguda karşılaştırılmaz
+        self._archive_state: Optional[tuple] = None
+        self.archive = (
+            EmbeddingArchive(archive_directory, quantization=archive_quantization)
+            if archive_directory else None
+        )
         
         # Dizini oluştur
         os.makedirs(persist_directory, exist_ok=True)
-        
-        # LangChain Chroma wrapper'ı başlat
-        if embeddings:
-            self.vectorstore = Chroma(
-                persist_directory=persist_directory,
-                collection_name=collection_name,
-                embedding_function=embeddings
-            )
-        else:
-            # Embeddings sonra set edilecek
-            self.vectorstore = None
+        self.client = _get_client(persist_directory)
+        # collection adı -> Chroma wrapper; switch_collection ile geri dönüşlerde
+        # collection yeniden açılmaz
+        self._wrappers: Dict[str, Chroma] = {}
         
         logger.info(f"VectorStore başlatıldı: {collection_name}")
     
+    def _make_chroma(self, collection_name: str, embeddings: Embeddings) -> Chroma:
+        """
+        Collection'ın LangChain Chroma wrapper'ını döndürür (collection yoksa index_params ile yaratılır).
+        Aynı embeddings ile daha önce açılmış collection'ların wrapper'ı yeniden kullanılır.
+        """
+        wrapper = self._wrappers.get(collection_name)
+        if wrapper is not None and wrapper.embeddings.inner is embeddings:
+            return wrapper
+        
+        collection_metadata = {"hnsw:space": self.similarity_metric}
+        collection_metadata.update((f"hnsw:{name}", value) for name, value in self.index_params.items())
+        wrapper = Chroma(
+            client=self.client,
+            collection_name=collection_name,
+            embedding_function=_NormalizedEmbeddings(embeddings),
+            collection_metadata=collection_metadata
+        )
+        self._wrappers[collection_name] = wrapper
+        return wrapper
+    
+    @staticmethod
+    def index_params_for_corpus_size(num_chunks: int) -> Dict:
+        """
+        Beklenen chunk sayısına göre HNSW parametre önerisi döndürür.
+        
+        Küçük collection'larda düşük M/ef indeksi küçük ve hızlı tutar; büyük
+        collection'larda recall düşmesin diye graf ve arama listesi büyütülür.
+        
+        Args:
+            num_chunks: Collection'da beklenen chunk sayısı
+            
+        Returns:
+            Dict: {'M', 'construction_ef', 'search_ef'}
+        """
+        if num_chunks < 10_000:
+            return {'M': 16, 'construction_ef': 100, 'search_ef': 32}
+        if num_chunks < 1_000_000:
+            return {'M': 32, 'construction_ef': 200, 'search_ef': 64}
+        return {'M': 48, 'construction_ef': 400, 'search_ef': 128}
+    
+    @property
+    def vectorstore(self) -> Optional[Chroma]:
+        """
+        Aktif collection'ın LangChain Chroma wrapper'ı (embeddings set edilmemişse None).
+        İlk erişimde oluşturulur, sonra (collection adı, embeddings) değişene kadar önbellekten döner.
+        """
+        if not self._embeddings:
+            return None
+        return self._make_chroma(self.collection_name, self._embeddings)
+    
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        """Sorguları embed eden LangChain Embeddings objesi"""
+        return self._embeddings
+    
     def set_embeddings(self, embeddings: Embeddings):
         """Embeddings'i set et (lazy initialization için)"""
         self._embeddings = embeddings
-        self.vectorstore = Chroma(
-            persist_directory=self.persist_directory,
-            collection_name=self.collection_name,
-            embedding_function=embeddings
-        )
+        self.version += 1
         logger.info("Embeddings set edildi")
     
     def add_documents(
         self,
         documents: List[Document],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        batch_size: Optional[int] = None
     ):
         """
         LangChain Document objelerini vektör veritabanına ekler.
+        Aynı ID ile aynı içerik ve metadata'ya sahip dokümanlar zaten kayıtlıysa
+        atlanır (tekrar embed edilmez ve yazılmaz).
         
         Args:
             documents: LangChain Document listesi
-            ids: Özel ID'ler (opsiyonel)
+            ids: Özel ID'ler (opsiyonel, verilmezse içerikten üretilir)
+            batch_size: Tek seferde embed edilip yazılacak doküman sayısı
+                (opsiyonel, verilmezse self.batch_size)
         """
         if not documents:
             raise ValueError("Documents boş olamaz")
@@ -78,21 +328,246 @@ class VectorStore:
         if not self.vectorstore:
             raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
         
-        logger.info(f"{len(documents)} doküman ekleniyor...")
+        if not ids:
+            ids = [document_id(doc) for doc in documents]
+        documents, ids = self._new_documents(documents, ids)
+        if not documents:
+            logger.info("Tüm dokümanlar zaten kayıtlı, ekleme yapılmadı")
+            return
         
-        # LangChain Chroma'nın add_documents metodunu kullan
-        if ids:
-            self.vectorstore.add_documents(documents=documents, ids=ids)
-        else:
-            self.vectorstore.add_documents(documents=documents)
+        self._write(documents, ids, batch_size=batch_size)
+    
+    def add_with_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None
+    ):
+        """
+        Hazır embedding'leri (aynı modelle üretilmiş) yeniden embed etmeden ekler.
+        Kayıtlı dokümanlar add_documents'taki gibi atlanır.
+        
+        Args:
+            texts: Metin listesi
+            embeddings: Metinlerle aynı sırada embedding vektörleri
+            metadatas: Metadata listesi (opsiyonel)
+            ids: Özel ID'ler (opsiyonel, verilmezse içerikten üretilir)
+        """
+        if not texts:
+            raise ValueError("Texts boş olamaz")
+        
+        if len(embeddings) != len(texts) or (metadatas is not None and len(metadatas) != len(texts)):
+            raise ValueError("Texts, embeddings ve metadatas aynı uzunlukta olmalı")
+        
+        if not self.vectorstore:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas or [{}] * len(texts))
+        ]
+        if not ids:
+            ids = [document_id(doc) for doc in documents]
+        vectors = _normalize_rows(embeddings)
+        
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        documents, ids = self._new_documents(documents, ids)
+        if not documents:
+            logger.info("Tüm dokümanlar zaten kayıtlı, ekleme yapılmadı")
+            return
+        if len(ids) < len(vectors):
+            vectors = vectors[[positions[doc_id] for doc_id in ids]]
+        
+        self._write(documents, ids, vectors)
+    
+    def _write(
+        self,
+        documents: List[Document],
+        ids: List[str],
+        vectors: Optional[np.ndarray] = None,
+        batch_size: Optional[int] = None
+    ):
+        """
+        Dokümanları Chroma'ya yazar, arşivi günceller ve version'ı artırır.
+        vectors verilmezse embedding'ler batch batch üretilir.
+        """
+        # Chroma tek upsert'te SQLite parametre sınırından türetilen en fazla
+        # get_max_batch_size() kayıt kabul eder
+        batch_size = min(batch_size or self.batch_size, self.client.get_max_batch_size())
+        batch_count = -(-len(documents) // batch_size)
+        logger.info(f"{len(documents)} doküman {batch_count} batch halinde ekleniyor...")
+        
+        durations = []
+        last_done = time.perf_counter()
+        
+        def finish(future):
+            """Önceki batch yazımını bekler ve süresini kaydeder"""
+            nonlocal last_done
+            future.result()
+            now = time.perf_counter()
+            durations.append(now - last_done)
+            last_done = now
+            logger.info(f"Batch {len(durations)}/{batch_count} yazıldı ({durations[-1]:.2f} sn)")
+        
+        upsert = self.vectorstore._collection.upsert
+        embed_documents = self._embeddings.embed_documents
+        # Senkron arşive sadece yazılan satırlar eklenir; değilse yazımdan sonra baştan kurulur
+        append_archive = self.archive is not None and self._archive_in_sync()
+        written = []
+        
+        # Sabit boyutlu batch'ler halinde yaz (tek dev upsert yerine). Bir batch
+        # Chroma'ya yazılırken sonraki batch embed edilir (encode GIL'i bırakır).
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for start in range(0, len(documents), batch_size):
+                batch = documents[start:start + batch_size]
+                if vectors is not None:
+                    embeddings = vectors[start:start + batch_size]
+                else:
+                    embeddings = _normalize_rows(embed_documents([doc.page_content for doc in batch]))
+                if append_archive:
+                    written.append(embeddings)
+                if pending:
+                    finish(pending)
+                pending = writer.submit(
+                    upsert,
+                    ids=ids[start:start + batch_size],
+                    embeddings=embeddings,
+                    documents=[doc.page_content for doc in batch],
+                    # Chroma boş metadata dict'ini kabul etmez
+                    metadatas=[doc.metadata or None for doc in batch]
+                )
+            if pending:
+                finish(pending)
+        
+        if append_archive:
+            self.archive.append(self.collection_name, ids, np.concatenate(written))
+        elif self.archive:
+            self._refresh_archive()
+        
+        self.version += 1
+        if self.archive:
+            self._archive_state = (self.version, True)
+        logger.info(
+            f"{len(documents)} doküman eklendi ({sum(durations):.2f} sn, "
+            f"batch başına ort. {sum(durations) / len(durations):.2f} sn, en uzun {max(durations):.2f} sn)"
+        )
+    
+    async def aadd_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ):
+        """
+        add_documents metodunun async versiyonu.
+        Embedding'ler yerel modelde üretildiğinden (HTTP çağrısı yok) eşzamanlı batch'ler
+        hız kazandırmaz; ekleme thread'de çalışır, event loop bloklanmaz.
+        
+        Args:
+            documents: LangChain Document listesi
+            ids: Özel ID'ler (opsiyonel, verilmezse içerikten üretilir)
+        """
+        await asyncio.to_thread(self.add_documents, documents, ids)
+    
+    def _new_documents(self, documents: List[Document], ids: List[str]) -> tuple:
+        """
+        Collection'da aynı ID, içerik ve metadata ile kayıtlı olmayan dokümanları döndürür.
+        
+        Returns:
+            tuple: (Eklenecek dokümanlar, ID'leri)
+        """
+        existing = {}
+        for start in range(0, len(ids), self.batch_size):
+            data = self.vectorstore._collection.get(
+                ids=ids[start:start + self.batch_size],
+                include=['documents', 'metadatas']
+            )
+            existing.update(
+                (doc_id, (text, metadata or {}))
+                for doc_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])
+            )
+        if not existing:
+            return documents, ids
+        
+        new = [
+            (doc, doc_id) for doc, doc_id in zip(documents, ids)
+            if existing.get(doc_id) != (doc.page_content, doc.metadata)
+        ]
+        logger.info(f"{len(documents) - len(new)} doküman zaten kayıtlı, atlandı")
+        return [doc for doc, _ in new], [doc_id for _, doc_id in new]
+    
+    def _archive_in_sync(self) -> bool:
+        """Arşivin collection ile aynı sayıda vektör içerip içermediği (version başına bir kez kontrol edilir)"""
+        if self._archive_state is None or self._archive_state[0] != self.version:
+            in_sync = self.archive.count(self.collection_name) == self._document_count()
+            self._archive_state = (self.version, in_sync)
+        return self._archive_state[1]
+    
+    def _refresh_archive(self):
+        """
+        Collection'ın tüm embedding'lerini Chroma'dan okuyup .npy arşivine yazar (yeniden encode etmeden).
+        Sadece arşiv collection ile senkron değilken kullanılır; normal yazımlar arşive eklenir.
+        """
+        data = self.vectorstore._collection.get(include=['embeddings'])
+        self.archive.save(self.collection_name, data['ids'], data['embeddings'])
+    
+    def scores_to_similarity(self, scores: np.ndarray) -> np.ndarray:
+        """
+        similarity_search_with_score skorlarını (Chroma mesafeleri) cosine benzerliğine çevirir.
+        
+        Args:
+            scores: Mesafe dizisi
+            
+        Returns:
+            np.ndarray: Cosine benzerlikleri (yüksek = benzer)
+        """
+        metadata = self.vectorstore._collection.metadata or {}
+        if metadata.get('hnsw:space', 'l2') == 'l2':
+            # Normalize vektörlerde kare L2 mesafesi = 2 - 2·cos
+            return 1.0 - scores / 2.0
+        # cosine: 1 - cos, ip: 1 - iç çarpım (birim vektörlerde ikisi aynı)
+        return 1.0 - scores
+    
+    def _archive_distance(self, similarity: float) -> float:
+        """Cosine benzerliğini collection'ın Chroma mesafe ölçüsüne çevirir (skorlar tutarlı kalsın)"""
+        metadata = self.vectorstore._collection.metadata or {}
+        if metadata.get('hnsw:space', 'l2') == 'l2':
+            # Normalize vektörlerde kare L2 mesafesi = 2 - 2·cos
+            return 2.0 - 2.0 * similarity
+        return 1.0 - similarity
+    
+    def _search_archive(self, embedding: np.ndarray, k: int) -> Optional[List[tuple]]:
+        """
+        Normalize sorgu embedding'ini .npy arşivi üzerinde arar.
+        Arşiv yoksa veya collection ile senkron değilse None döner.
+        """
+        if not self._archive_in_sync():
+            return None
+        
+        hits = self.archive.search(self.collection_name, embedding, k=k)
+        if not hits:
+            return None
         
-        logger.info(f"{len(documents)} doküman eklendi")
+        data = self.vectorstore._collection.get(
+            ids=[doc_id for doc_id, _ in hits],
+            include=['documents', 'metadatas']
+        )
+        by_id = {
+            doc_id: Document(page_content=text, metadata=metadata or {})
+            for doc_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])
+        }
+        return [
+            (by_id[doc_id], self._archive_distance(score))
+            for doc_id, score in hits
+            if doc_id in by_id
+        ]
     
     def add_texts_with_metadata(
         self,
         texts: List[str],
-        embeddings: List[List[float]],
-        metadatas: List[Dict],
+        embeddings: Optional[List[List[float]]] = None,
+        metadatas: Optional[List[Dict]] = None,
         ids: Optional[List[str]] = None
     ):
         """
@@ -101,7 +576,7 @@ class VectorStore:
         
         Args:
             texts: Metin listesi
-            embeddings: Embedding vektörleri (kullanılmaz, LangChain otomatik oluşturur)
+            embeddings: Hazır embedding vektörleri (opsiyonel, verilirse yeniden embed edilmez)
             metadatas: Metadata listesi
             ids: Özel ID'ler (opsiyonel)
         """
@@ -111,12 +586,13 @@ class VectorStore:
         if len(texts) != len(metadatas):
             raise ValueError("Texts ve metadatas aynı uzunlukta olmalı")
         
-        # Document objelerine dönüştür
-        documents = []
-        for i, (text, metadata) in enumerate(zip(texts, metadatas)):
-            doc_id = ids[i] if ids and i < len(ids) else None
-            doc = Document(page_content=text, metadata=metadata)
-            documents.append(doc)
+        if embeddings is not None:
+            # Hazır vektörler yeniden embed edilmeden yazılır
+            self.add_with_embeddings(texts, embeddings, metadatas, ids=ids)
+            return
+        
+        # Document objelerine dönüştür (ID'ler add_documents'a ayrıca verilir)
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
         
         self.add_documents(documents, ids=ids)
     
@@ -137,13 +613,65 @@ class VectorStore:
         Returns:
             List[tuple]: (Document, score) tuple listesi
         """
-        if not self.vectorstore:
+        if self.vectorstore is None:
             raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
         
-        if filter:
-            return self.vectorstore.similarity_search_with_score(query, k=k, filter=filter)
-        else:
-            return self.vectorstore.similarity_search_with_score(query, k=k)
+        return self.similarity_search_by_vector_with_score(self._embeddings.embed_query(query), k=k, filter=filter)
+    
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filter: Optional[Dict] = None
+    ) -> List[tuple]:
+        """
+        Hazır sorgu embedding'iyle arama yapar (soru tekrar embed edilmez).
+        
+        Args:
+            embedding: Sorgu embedding'i
+            k: Döndürülecek en iyi sonuç sayısı
+            filter: Metadata filtresi (opsiyonel)
+            
+        Returns:
+            List[tuple]: (Document, score) tuple listesi (score: Chroma mesafesi)
+        """
+        vs = self.vectorstore
+        if vs is None:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        embedding = _normalize_rows(embedding)[0]
+        if self.archive and not filter:
+            results = self._search_archive(embedding, k)
+            if results is not None:
+                return results
+        
+        return vs.similarity_search_by_vector_with_relevance_scores(
+            embedding.tolist(), k=k, filter=filter or None
+        )
+    
+    async def asimilarity_search(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        """
+        Birden fazla sorguyu eşzamanlı arar (multi-query/HyDE gibi fan-out'lar için).
+        Her arama ayrı thread'de çalışır; Chroma'nın HNSW (hnswlib) çekirdeği araması sırasında GIL'i
+        bıraktığından aramalar gerçekten paralel yürür ve event loop bloklanmaz.
+        
+        Args:
+            queries: Sorgu metinleri
+            k: Sorgu başına döndürülecek en iyi sonuç sayısı
+            filter: Metadata filtresi (opsiyonel, tüm sorgulara uygulanır)
+            
+        Returns:
+            List[List[tuple]]: Sorgu sırasıyla (Document, score) tuple listeleri
+        """
+        return await asyncio.gather(*(
+            asyncio.to_thread(self.similarity_search_with_score, query, k, filter)
+            for query in queries
+        ))
     
     def search(
         self,
@@ -153,66 +681,105 @@ class VectorStore:
     ) -> List[Dict]:
         """
         Backward compatibility için - eski API'yi destekler.
-        Vektör veritabanında arama yapar.
+        Vektör veritabanında hazır embedding ile arama yapar.
         
         Args:
-            query_embedding: Sorgu embedding vektörü (kullanılmaz, query string gerekli)
+            query_embedding: Sorgu embedding vektörü
             top_k: Döndürülecek en iyi sonuç sayısı
             filter_metadata: Metadata filtresi (opsiyonel)
             
         Returns:
-            List[Dict]: Her sonuç için {'text': str, 'metadata': dict, 'distance': float}
+            List[Dict]: Her sonuç için {'text': str, 'metadata': dict, 'distance': float, 'similarity': float}
         """
-        # Bu metod artık kullanılmamalı, similarity_search_with_score kullanılmalı
-        # Ama backward compatibility için korunuyor
-        raise NotImplementedError(
-            "Bu metod artık desteklenmiyor. "
-            "query string ile similarity_search_with_score() kullanın."
-        )
+        return self.batch_search([query_embedding], top_k, filter_metadata)[0]
     
-    def delete_collection(self):
-        """Collection'ı siler"""
-        try:
-            self.client.delete_collection(name=self.collection_name)
-            logger.info(f"Collection silindi: {self.collection_name}")
-        except Exception as e:
-            logger.error(f"Collection silinirken hata: {e}")
+    def batch_search(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filter_metadata: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Birden fazla sorgu embedding'ini tek Chroma çağrısıyla arar
+        (HNSW aramaları tek seferde yapılır, Python/FFI maliyeti sorgu başına ödenmez).
+        
+        Args:
+            query_embeddings: Sorgu embedding vektörleri
+            top_k: Sorgu başına döndürülecek en iyi sonuç sayısı
+            filter_metadata: Metadata filtresi (opsiyonel, tüm sorgulara uygulanır)
+            
+        Returns:
+            List[List[Dict]]: Sorgu sırasıyla {'text', 'metadata', 'distance', 'similarity'} listeleri
+                (similarity: collection'ın mesafe ölçüsünden çevrilmiş cosine benzerliği)
+        """
+        vs = self.vectorstore
+        if vs is None:
+            raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
+        
+        if len(query_embeddings) == 0:
+            return []
+        
+        result = vs._collection.query(
+            query_embeddings=_normalize_rows(query_embeddings),
+            n_results=top_k,
+            where=filter_metadata or None,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            [
+                {'text': text, 'metadata': metadata or {}, 'distance': distance, 'similarity': similarity}
+                for text, metadata, distance, similarity in zip(
+                    texts,
+                    metadatas,
+                    distances,
+                    self.scores_to_similarity(np.asarray(distances, dtype=np.float64)).tolist()
+                )
+            ]
+            for texts, metadatas, distances in zip(
+                result['documents'], result['metadatas'], result['distances']
+            )
+        ]
     
     def get_collection_info(self) -> Dict:
         """Collection hakkında bilgi döndürür"""
-        if not self.vectorstore:
+        if self.vectorstore is None:
             return {
                 'collection_name': self.collection_name,
                 'document_count': 0,
                 'persist_directory': self.persist_directory
             }
         
-        # Chroma collection'a eriş
-        collection = self.vectorstore._collection
-        count = collection.count()
         return {
             'collection_name': self.collection_name,
-            'document_count': count,
+            'document_count': self._document_count(),
             'persist_directory': self.persist_directory
         }
     
+    def _document_count(self) -> int:
+        """Collection'daki doküman sayısı (SQL COUNT sadece version değiştiğinde tekrarlanır)"""
+        if self._count_cache is None or self._count_cache[0] != self.version:
+            self._count_cache = (self.version, self.vectorstore._collection.count())
+        return self._count_cache[1]
+    
     def reset_collection(self):
         """Collection'ı sıfırlar (tüm dokümanları siler)"""
+        # Boş collection bir sonraki vectorstore erişiminde yeniden yaratılır
         self.delete_collection()
-        if self._embeddings:
-            self.vectorstore = Chroma(
-                persist_directory=self.persist_directory,
-                collection_name=self.collection_name,
-                embedding_function=self._embeddings
-            )
         logger.info("Collection sıfırlandı")
     
     def delete_collection(self):
         """Collection'ı siler"""
         try:
-            if self.vectorstore:
-                # Chroma collection'ı sil
-                self.vectorstore.delete_collection()
+            vs = self.vectorstore
+            if vs is not None:
+                # Chroma collection'ı sil (wrapper silinen collection'ı tutmaya devam eder)
+                vs.delete_collection()
+                self._wrappers.pop(self.collection_name, None)
+                self._count_cache = None
+            if self.archive:
+                self.archive.delete(self.collection_name)
+                self._archive_state = None
+            self.version += 1
             logger.info(f"Collection silindi: {self.collection_name}")
         except Exception as e:
             logger.error(f"Collection silinirken hata: {e}")
@@ -220,17 +787,15 @@ class VectorStore:
     def list_collections(self) -> List[Dict]:
         """Tüm collection'ları listeler"""
         try:
-            from langchain_chroma import Chroma
-            import chromadb
-            
-            # ChromaDB client oluştur
-            client = chromadb.PersistentClient(path=self.persist_directory)
-            collections = client.list_collections()
+            collections = self.client.list_collections()
+            counts = self._collection_counts()
             
             result = []
             for col in collections:
                 try:
-                    count = col.count()
+                    count = counts.get(str(col.id)) if counts is not None else None
+                    if count is None:
+                        count = col.count()
                     result.append({
                         'name': col.name,
                         'count': count
@@ -242,15 +807,31 @@ class VectorStore:
             logger.error(f"Collection listesi alınamadı: {e}")
             return []
     
+    def _collection_counts(self) -> Optional[Dict[str, int]]:
+        """
+        Tüm collection'ların doküman sayısını Chroma'nın SQLite dosyasından tek sorguyla okur
+        (collection başına ayrı count() çağrısı yerine).
+        
+        Returns:
+            Optional[Dict[str, int]]: Collection id -> doküman sayısı (şema uyuşmazsa None)
+        """
+        path = os.path.join(os.path.abspath(self.persist_directory), "chroma.sqlite3")
+        try:
+            with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+                rows = conn.execute(
+                    "SELECT s.collection, COUNT(e.id) FROM segments s "
+                    "LEFT JOIN embeddings e ON e.segment_id = s.id "
+                    "WHERE s.scope = 'METADATA' GROUP BY s.collection"
+                ).fetchall()
+            return dict(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Collection sayıları toplu okunamadı, tek tek sayılacak: {e}")
+            return None
+    
     def switch_collection(self, collection_name: str):
         """Aktif collection'ı değiştirir"""
         self.collection_name = collection_name
-        if self._embeddings:
-            self.vectorstore = Chroma(
-                persist_directory=self.persist_directory,
-                collection_name=collection_name,
-                embedding_function=self._embeddings
-            )
+        self.version += 1
         logger.info(f"Collection değiştirildi: {collection_name}")
     
     def as_retriever(self, **kwargs):
@@ -263,8 +844,13 @@ class VectorStore:
         Returns:
             VectorStoreRetriever: LangChain retriever objesi
         """
-        if not self.vectorstore:
+        vs = self.vectorstore
+        if vs is None:
             raise ValueError("Embeddings set edilmemiş. set_embeddings() çağırın.")
         
-        return self.vectorstore.as_retriever(**kwargs)
+        if set(kwargs) <= {"search_kwargs"}:
+            # Aramalar similarity_search_with_score üzerinden (arşiv varsa .npy) yapılır
+            return _StoreRetriever(vector_store=self, search_kwargs=kwargs.get("search_kwargs", {}))
+        
+        return vs.as_retriever(**kwargs)
 
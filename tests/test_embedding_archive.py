@@ -0,0 +1,56 @@
+"""
+EmbeddingArchive testleri
+"""
+
+import numpy as np
+import pytest
+
+from src.embedding_archive import EmbeddingArchive
+
+
+def _unit_rows(rng, count: int, dimension: int = 16) -> np.ndarray:
+    """Birim uzunlukta rastgele vektörler"""
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("quantization", [None, "int8", "binary"])
+def test_append_matches_full_save(tmp_path, quantization):
+    """append ile büyütülen arşiv, aynı içerikle baştan kaydedilen arşivle aynı olmalı"""
+    rng = np.random.default_rng(0)
+    first, second = _unit_rows(rng, 20), _unit_rows(rng, 5)
+    changed = _unit_rows(rng, 1)
+    
+    appended = EmbeddingArchive(str(tmp_path / "appended"), quantization=quantization)
+    appended.save("abc", [f"id{i}" for i in range(20)], first)
+    appended.append("abc", ["id3", "a-longer-id-than-the-others"] + [f"id{i}" for i in range(21, 25)],
+                    np.concatenate([changed, second]))
+    
+    expected_rows = first.copy()
+    expected_rows[3] = changed[0]
+    expected_rows = np.concatenate([expected_rows, second])
+    expected_ids = [f"id{i}" for i in range(20)] + ["a-longer-id-than-the-others"] + [f"id{i}" for i in range(21, 25)]
+    full = EmbeddingArchive(str(tmp_path / "full"), quantization=quantization)
+    full.save("abc", expected_ids, expected_rows)
+    
+    ids, matrix = appended.load("abc")
+    expected_ids_array, expected_matrix = full.load("abc")
+    assert list(ids) == list(expected_ids_array)
+    assert np.array_equal(np.asarray(matrix), np.asarray(expected_matrix))
+    assert appended.count("abc") == len(expected_ids)
+    assert appended.search("abc", changed[0], k=1)[0][0] == "id3"
+
+
+def test_int8_search_scores_close_to_float(tmp_path):
+    """int8 arşivde blok blok hesaplanan skorlar float32 cosine benzerliğine yakın olmalı"""
+    rng = np.random.default_rng(1)
+    rows = _unit_rows(rng, 5000, dimension=64)
+    archive = EmbeddingArchive(str(tmp_path), quantization="int8")
+    archive.save("abc", [f"id{i}" for i in range(len(rows))], rows)
+    
+    query = rows[42]
+    results = archive.search("abc", query, k=len(rows))
+    expected = rows @ query
+    assert results[0][0] == "id42"
+    for doc_id, score in results:
+        assert abs(score - expected[int(doc_id[2:])]) < 0.02
@@ -0,0 +1,77 @@
+"""
+FaissVectorStore testleri
+"""
+
+import pytest
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+pytest.importorskip("faiss")
+
+from src.faiss_store import FaissVectorStore
+
+
+NUM_DOCS = 3000
+
+
+def _top_result(store: FaissVectorStore, query: str) -> str:
+    """Sorgu için en iyi sonucun metnini döndürür"""
+    return store.similarity_search_with_score(query, k=1)[0][0].page_content
+
+
+@pytest.mark.parametrize("index_type", ["sq8", "ivfpq"])
+def test_readd_changed_id_after_compression(tmp_path, index_type):
+    """Sıkıştırılmış index'te değişen bir ID yeniden eklenince diğer pozisyonlar kaymamalı"""
+    store = FaissVectorStore(
+        persist_directory=str(tmp_path),
+        collection_name="abc",
+        embeddings=DeterministicFakeEmbedding(size=64),
+        index_type=index_type,
+        compress_min_vectors=NUM_DOCS,
+        nprobe=1024
+    )
+    store.add_documents(
+        [Document(page_content=f"doc {i}") for i in range(NUM_DOCS)],
+        ids=[f"id{i}" for i in range(NUM_DOCS)]
+    )
+    assert type(store.vectorstore.index).__name__ != "IndexFlat"
+    
+    queries = ["doc 0", "doc 4", "doc 6", "doc 2500", f"doc {NUM_DOCS - 1}"]
+    before = [_top_result(store, query) for query in queries]
+    
+    store.add_documents([Document(page_content="doc 5 changed")], ids=["id5"])
+    
+    assert store.vectorstore.index.ntotal == NUM_DOCS
+    assert [_top_result(store, query) for query in queries] == before
+    assert _top_result(store, "doc 5 changed") == "doc 5 changed"
+    
+    # Diskten yeniden yüklenen index de aynı eşlemeyi vermeli
+    reloaded = FaissVectorStore(
+        persist_directory=str(tmp_path),
+        collection_name="abc",
+        embeddings=DeterministicFakeEmbedding(size=64),
+        index_type=index_type,
+        compress_min_vectors=NUM_DOCS,
+        nprobe=1024
+    )
+    assert [_top_result(reloaded, query) for query in queries] == before
+
+
+def test_list_collections_and_add_after_delete(tmp_path):
+    """Koleksiyon sayıları index açılmadan okunmalı, silinen koleksiyona tekrar eklenebilmeli"""
+    store = FaissVectorStore(
+        persist_directory=str(tmp_path),
+        collection_name="abc",
+        embeddings=DeterministicFakeEmbedding(size=16)
+    )
+    store.add_documents([Document(page_content=f"doc {i}") for i in range(6)])
+    store.switch_collection("def")
+    store.add_documents([Document(page_content="x")])
+    
+    assert store.list_collections() == [{"name": "abc", "count": 6}, {"name": "def", "count": 1}]
+    
+    store.delete_collection()
+    assert store.list_collections() == [{"name": "abc", "count": 6}]
+    
+    store.add_documents([Document(page_content="y"), Document(page_content="z")])
+    assert store.get_collection_info()["document_count"] == 2
@@ -0,0 +1,91 @@
+"""
+OllamaLLMHandler testleri (yerel sahte Ollama sunucusuyla)
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from langchain_community.llms import Ollama
+from langchain_community.llms import ollama as ollama_module
+
+from src.llm_handler import OllamaLLMHandler
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    """/api/generate ve /api/chat için iki parçalı streaming cevap dönen sahte sunucu"""
+    
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    bodies = []
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        _FakeOllama.connections.add(self.client_address)
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        _FakeOllama.bodies.append(request)
+        if self.path == "/api/chat":
+            lines = [
+                {"message": {"role": "assistant", "content": "Mer"}, "done": False},
+                {"message": {"role": "assistant", "content": "haba"}, "done": True}
+            ]
+        else:
+            lines = [{"response": "Mer", "done": False}, {"response": "haba", "done": True}]
+        body = ("\n".join(json.dumps(line) for line in lines) + "\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def base_url():
+    """Her test için boş kayıtlarla çalışan sahte Ollama sunucusu"""
+    _FakeOllama.connections = set()
+    _FakeOllama.bodies = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_sequential_calls_reuse_one_connection(base_url):
+    """LLM ve chat çağrıları aynı keep-alive bağlantısını kullanmalı"""
+    llm = OllamaLLMHandler(base_url=base_url)
+    chat = OllamaLLMHandler(base_url=base_url, use_chat=True)
+    
+    assert llm.generate("soru") == "Merhaba"
+    assert "".join(llm.generate("soru", stream=True)) == "Merhaba"
+    assert chat.generate("soru") == "Merhaba"
+    assert llm.generate("soru", max_tokens=3) == "Merhaba"
+    
+    assert len(_FakeOllama.bodies) == 4
+    assert len(_FakeOllama.connections) == 1
+
+
+def test_ollama_module_left_untouched(base_url):
+    """Havuzlu taşıma sadece çağrı süresince kurulmalı; LangChain modülü değişmeden kalmalı"""
+    assert ollama_module.requests is requests
+    OllamaLLMHandler(base_url=base_url).generate("soru")
+    assert ollama_module.requests is requests
+
+
+def test_request_body_matches_langchain(base_url):
+    """Havuzlu wrapper LangChain'in kendi Ollama'sıyla aynı istek gövdesini göndermeli"""
+    handler = OllamaLLMHandler(base_url=base_url, keep_alive=None)
+    handler.generate("soru", max_tokens=7)
+    Ollama(
+        model=handler.model_name,
+        base_url=base_url,
+        temperature=handler.temperature,
+        num_predict=handler.max_tokens,
+        timeout=handler.timeout
+    ).invoke("soru", num_predict=7)
+    
+    pooled, upstream = _FakeOllama.bodies
+    assert pooled == upstream